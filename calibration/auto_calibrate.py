@@ -5,10 +5,27 @@ Automatic calibration routines for printer parameters
 import numpy as np
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
-import json
+from concurrent.futures import ProcessPoolExecutor
+import orjson
+import os
+import sys
 import time
 
-@dataclass
+# Buffer size for calibration file I/O: 64 KiB is a multiple of common
+# filesystem block sizes, so a whole calibration record is written or read
+# in a single syscall
+IO_BUFFER_SIZE = 64 * 1024
+
+# Parameter keys are built and interned once at import, so every calibration
+# run reuses the same key objects and their cached hashes
+MOTOR_AXES = ('x', 'y', 'z', 'e')
+MEASURED_AXES = ('x', 'y')
+_MOTOR_CURRENT_KEYS = tuple(sys.intern(f'motor_current_{axis}') for axis in MOTOR_AXES)
+_RESONANCE_FREQ_KEYS = tuple(sys.intern(f'resonance_freq_{axis}') for axis in MEASURED_AXES)
+_RESONANCE_DAMPING_KEYS = tuple(sys.intern(f'resonance_damping_{axis}') for axis in MEASURED_AXES)
+_BACKLASH_KEYS = tuple(sys.intern(f'backlash_{axis}') for axis in MEASURED_AXES)
+
+@dataclass(slots=True)
 class CalibrationResult:
     """Results of calibration procedure"""
     success: bool
@@ -32,14 +49,17 @@ class CalibrationResult:
     
     def save(self, filename: str):
         """Save calibration results to file"""
-        with open(filename, 'w') as f:
-            json.dump(self.to_dict(), f, indent=2)
+        with open(filename, 'wb', buffering=IO_BUFFER_SIZE) as f:
+            f.write(orjson.dumps(
+                self.to_dict(),
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            ))
     
     @classmethod
     def load(cls, filename: str) -> 'CalibrationResult':
         """Load calibration results from file"""
-        with open(filename, 'r') as f:
-            data = json.load(f)
+        with open(filename, 'rb', buffering=IO_BUFFER_SIZE) as f:
+            data = orjson.loads(f.read())
         
         return cls(
             success=data['success'],
@@ -51,9 +71,26 @@ class CalibrationResult:
             duration=data['duration']
         )
 
+def _run_full_calibration(save_path: Optional[str]) -> CalibrationResult:
+    """Worker entry point for batch calibration (simulated hardware)"""
+    return AutoCalibrator().full_calibration(save_path)
+
 class AutoCalibrator:
     """Automatic calibration system for printer parameters"""
     
+    # Parameters every calibration must provide
+    REQUIRED_PARAMETERS = ('resonance_freq_x', 'resonance_freq_y', 'mass_x', 'mass_y')
+    _REQUIRED_CHECKS = tuple((param, sys.intern(f'has_{param}')) for param in REQUIRED_PARAMETERS)
+    
+    # Plausibility ranges: (parameter, check name, low, high)
+    VALIDATION_SPECS = (
+        ('resonance_freq_x', 'resonance_x_in_range', 10, 200),
+        ('resonance_freq_y', 'resonance_y_in_range', 10, 200),
+        ('mass_x', 'mass_x_plausible', 0.1, 5.0),
+    )
+    _VALIDATION_LOWS = np.array(list(zip(*VALIDATION_SPECS))[2], dtype=np.float64)
+    _VALIDATION_HIGHS = np.array(list(zip(*VALIDATION_SPECS))[3], dtype=np.float64)
+    
     def __init__(self, hardware_interface=None):
         self.hardware = hardware_interface
         self.results = None
@@ -91,24 +128,23 @@ class AutoCalibrator:
             stiffness_data = self._measure_stiffness()
             
             # Combine all parameters
-            parameters = {
-                **motor_currents,
-                **resonance_data,
-                **backlash_data,
-                **inertia_data,
-                **stiffness_data
-            }
+            parameters = {}
+            parameters.update(motor_currents)
+            parameters.update(resonance_data)
+            parameters.update(backlash_data)
+            parameters.update(inertia_data)
+            parameters.update(stiffness_data)
             
             # Extract resonance peaks for reporting
-            resonance_peaks = []
-            for axis in ['x', 'y']:
-                freq_key = f'resonance_freq_{axis}'
-                if freq_key in parameters:
-                    resonance_peaks.append({
-                        'axis': axis,
-                        'frequency': parameters[freq_key],
-                        'amplitude': 1.0  # Simplified
-                    })
+            resonance_peaks = [
+                {
+                    'axis': key[len('resonance_freq_'):],
+                    'frequency': value,
+                    'amplitude': 1.0  # Simplified
+                }
+                for key, value in resonance_data.items()
+                if key.startswith('resonance_freq_')
+            ]
             
             duration = time.time() - start_time
             
@@ -144,18 +180,49 @@ class AutoCalibrator:
                 duration=duration
             )
     
+    def batch_calibrate(self, n: int, save_dir: Optional[str] = None) -> List[CalibrationResult]:
+        """
+        Perform n independent full calibrations
+        
+        Simulated runs are distributed over worker processes. With hardware
+        attached all runs share one printer, so they run sequentially.
+        
+        Args:
+            n: Number of calibration runs
+            save_dir: Optional directory for calibration_NNN.json results
+        
+        Returns:
+            List of CalibrationResult objects in run order
+        """
+        if n <= 0:
+            return []
+        
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+            save_paths = [os.path.join(save_dir, f'calibration_{i:03d}.json')
+                          for i in range(n)]
+        else:
+            save_paths = [None] * n
+        
+        if self.hardware:
+            return [self.full_calibration(path) for path in save_paths]
+        
+        max_workers = min(n, os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_run_full_calibration, save_paths))
+    
     def _calibrate_motor_currents(self) -> Dict[str, float]:
         """Calibrate optimal motor currents"""
         if self.hardware:
             # Real hardware calibration
             currents = {}
-            for axis in ['x', 'y', 'z', 'e']:
+            for key, axis in zip(_MOTOR_CURRENT_KEYS, MOTOR_AXES):
                 try:
                     # This would use the hardware interface
                     current = self.hardware.auto_tune_current(axis)
-                    currents[f'motor_current_{axis}'] = current
+                    currents[key] = current
                 except:
-                    currents[f'motor_current_{axis}'] = 1.2  # Default
+                    currents[key] = 1.2  # Default
         else:
             # Simulated calibration
             currents = {
@@ -172,7 +239,8 @@ class AutoCalibrator:
         if self.hardware:
             # Real hardware measurement
             resonance_data = {}
-            for axis in ['x', 'y']:
+            for freq_key, damping_key, axis in zip(
+                    _RESONANCE_FREQ_KEYS, _RESONANCE_DAMPING_KEYS, MEASURED_AXES):
                 try:
                     results = self.hardware.measure_resonance(axis)
                     if results['resonance_peaks']:
@@ -182,8 +250,8 @@ class AutoCalibrator:
                 except:
                     freq = 45.0 if axis == 'x' else 38.0
                 
-                resonance_data[f'resonance_freq_{axis}'] = freq
-                resonance_data[f'resonance_damping_{axis}'] = 0.1
+                resonance_data[freq_key] = freq
+                resonance_data[damping_key] = 0.1
         else:
             # Simulated measurement
             resonance_data = {
@@ -200,14 +268,14 @@ class AutoCalibrator:
         if self.hardware:
             # Real hardware measurement
             backlash_data = {}
-            for axis in ['x', 'y']:
+            for key, axis in zip(_BACKLASH_KEYS, MEASURED_AXES):
                 try:
                     # This would involve moving back and forth
                     backlash = self.hardware.measure_backlash(axis)
                 except:
                     backlash = 0.01
                 
-                backlash_data[f'backlash_{axis}'] = backlash
+                backlash_data[key] = backlash
         else:
             # Simulated measurement
             backlash_data = {
@@ -296,24 +364,24 @@ class AutoCalibrator:
     def validate_calibration(self, results: CalibrationResult) -> Dict[str, bool]:
         """Validate calibration results"""
         checks = {}
+        parameters = results.parameters
         
         # Check required parameters
-        required = ['resonance_freq_x', 'resonance_freq_y', 'mass_x', 'mass_y']
-        for param in required:
-            checks[f'has_{param}'] = param in results.parameters
+        for param, check in self._REQUIRED_CHECKS:
+            checks[check] = param in parameters
         
-        # Check parameter ranges
-        if 'resonance_freq_x' in results.parameters:
-            freq = results.parameters['resonance_freq_x']
-            checks['resonance_x_in_range'] = 10 <= freq <= 200
-        
-        if 'resonance_freq_y' in results.parameters:
-            freq = results.parameters['resonance_freq_y']
-            checks['resonance_y_in_range'] = 10 <= freq <= 200
+        # Check parameter ranges in one pass; missing parameters get no
+        # range check, present NaN values fail it
+        values = np.array(
+            [parameters.get(name, np.nan) for name, _, _, _ in self.VALIDATION_SPECS],
+            dtype=np.float64
+        )
+        in_range = ((values >= self._VALIDATION_LOWS) & (values <= self._VALIDATION_HIGHS)
+                    & ~np.isnan(values))
         
-        if 'mass_x' in results.parameters:
-            mass = results.parameters['mass_x']
-            checks['mass_x_plausible'] = 0.1 <= mass <= 5.0
+        for (name, check, _, _), ok in zip(self.VALIDATION_SPECS, in_range.tolist()):
+            if name in parameters:
+                checks[check] = ok
         
         # Overall validation
         checks['all_checks_passed'] = all(checks.values())
@@ -1,11 +1,11 @@
 import numpy as np
-from scipy.integrate import solve_ivp
-from dataclasses import dataclass
+from numba import njit
+from dataclasses import dataclass, asdict
 from typing import Tuple, List, Optional, Dict
-import json
-import matplotlib.pyplot as plt
+from functools import lru_cache
+import math
 
-@dataclass
+@dataclass(slots=True)
 class PrinterParams:
     """Параметры физической модели принтера"""
     # Механические параметры
@@ -36,29 +36,180 @@ class PrinterParams:
     microsteps: int = 16
     
     def to_dict(self) -> Dict:
-        return self.__dict__
+        return asdict(self)
     
     @classmethod
     def from_calibration(cls, calibration_data: dict):
         """Создание параметров из данных калибровки"""
         return cls(**calibration_data)
 
+# Коэффициенты ПД-регулятора относительно жесткости и демпфирования
+KP_SCALE = 0.1
+KD_SCALE = 0.05
+
+# Тип отсчетов симуляции: ~7 значащих цифр достаточно для мм и м/с,
+# а float32 вдвое сокращает объем памяти на длинных траекториях.
+# Рекурсия по сегментам и метрики считаются в float64
+SAMPLE_DTYPE = np.float32
+
+def _pack_params(params: PrinterParams) -> np.ndarray:
+    """Упаковка параметров в плоский массив для JIT-ядра"""
+    return _model_coefficients(
+        params.mass_x, params.c_x, params.k_x,
+        params.mass_y, params.c_y, params.k_y,
+        params.mass_z, params.c_z, params.k_z
+    )
+
+@lru_cache(maxsize=32)
+def _model_coefficients(m_x: float, c_x: float, k_x: float,
+                        m_y: float, c_y: float, k_y: float,
+                        m_z: float, c_z: float, k_z: float) -> np.ndarray:
+    """
+    Упакованные коэффициенты модели для фиксированных параметров
+    
+    Раскладка массива: [m, c, k] для осей X/Y/Z, KP_SCALE, KD_SCALE,
+    собственные частоты omega0 X/Y/Z, коэффициенты демпфирования zeta X/Y/Z.
+    Результат кэшируется по значениям параметров и разделяется между
+    вызовами, поэтому массив доступен только для чтения.
+    """
+    mass = np.array([m_x, m_y, m_z])
+    damping = np.array([c_x, c_y, c_z])
+    stiffness = np.array([k_x, k_y, k_z])
+    
+    omega0 = np.sqrt(stiffness / mass)
+    zeta = damping / (2.0 * np.sqrt(stiffness * mass))
+    
+    packed = np.concatenate((
+        np.column_stack((mass, damping, stiffness)).ravel(),
+        [KP_SCALE, KD_SCALE],
+        omega0,
+        zeta
+    ))
+    packed.setflags(write=False)
+    return packed
+
+@njit(cache=True, fastmath=True)
+def _transition(omega0, zeta, tau):
+    """
+    Матрица перехода Phi(tau) осциллятора xdd + 2*zeta*omega0*xd + omega0^2*x = 0
+
+    tau может быть скаляром или массивом моментов времени.
+
+    Returns:
+        (p00, p01, p10, p11) для [x, xd](tau) = Phi(tau) @ [x, xd](0)
+    """
+    if abs(zeta - 1.0) < 1e-9:
+        # Критическое демпфирование
+        e = np.exp(-omega0 * tau)
+        return (e * (1.0 + omega0 * tau), e * tau,
+                -e * omega0 * omega0 * tau, e * (1.0 - omega0 * tau))
+
+    if zeta < 1.0:
+        # Колебательный режим
+        omega_d = omega0 * math.sqrt(1.0 - zeta * zeta)
+        e = np.exp(-zeta * omega0 * tau)
+        s = np.sin(omega_d * tau)
+        c = np.cos(omega_d * tau)
+        return (e * (c + zeta * omega0 / omega_d * s), e * s / omega_d,
+                -e * omega0 * omega0 / omega_d * s, e * (c - zeta * omega0 / omega_d * s))
+
+    # Апериодический режим
+    root = omega0 * math.sqrt(zeta * zeta - 1.0)
+    r1 = -zeta * omega0 + root
+    r2 = -zeta * omega0 - root
+    e1 = np.exp(r1 * tau)
+    e2 = np.exp(r2 * tau)
+    inv = 1.0 / (r1 - r2)
+    return ((r1 * e2 - r2 * e1) * inv, (e1 - e2) * inv,
+            r1 * r2 * (e2 - e1) * inv, (r1 * e1 - r2 * e2) * inv)
+
+@njit(cache=True, fastmath=True)
+def _goertzel(samples, fs, f_target):
+    """Амплитуда спектра на одной частоте (алгоритм Герцеля), нормированная на n"""
+    n = samples.shape[0]
+    coeff = 2.0 * math.cos(2.0 * math.pi * f_target / fs)
+    s1 = 0.0
+    s2 = 0.0
+    for i in range(n):
+        s = samples[i] + coeff * s1 - s2
+        s2 = s1
+        s1 = s
+    power = s1 * s1 + s2 * s2 - coeff * s1 * s2
+    return math.sqrt(max(power, 0.0)) / n
+
+@njit(cache=True, fastmath=True)
+def _simulate_njit(trajectory, targets, pos0, vel0, params_arr):
+    """
+    Рекуррентный проход по сегментам траектории
+
+    На каждом сегменте сила постоянна, поэтому каждая ось - линейный
+    осциллятор, и состояние в конце сегмента получается за одно
+    применение Phi(t_end - t_start). Обратная связь ПД-регулятора делает
+    рекурсию последовательной, поэтому здесь считаются только состояния
+    на границах сегментов.
+
+    Args:
+        trajectory: Массив [time, target_x, target_y, target_z]
+        targets: Цели сегментов с учетом люфта, массив (n_seg, 3)
+        pos0: Начальные позиции [x, y, z]
+        vel0: Начальные скорости [x_dot, y_dot, z_dot]
+        params_arr: Параметры модели (см. _pack_params)
+
+    Returns:
+        (seg_pos, seg_vel, seg_force) - позиция и скорость в начале
+        каждого сегмента и управляющая сила на нем, массивы (n_seg, 3)
+    """
+    n_seg = trajectory.shape[0] - 1
+    seg_pos = np.empty((n_seg, 3))
+    seg_vel = np.empty((n_seg, 3))
+    seg_force = np.empty((n_seg, 3))
+
+    kp_scale = params_arr[9]
+    kd_scale = params_arr[10]
+
+    pos = pos0.copy()
+    vel = vel0.copy()
+
+    for i in range(n_seg):
+        span = trajectory[i + 1, 0] - trajectory[i, 0]
+
+        for a in range(3):
+            c = params_arr[3 * a + 1]
+            k = params_arr[3 * a + 2]
+
+            # Простая ПД-имитация для расчета управляющей силы
+            u = k * kp_scale * (targets[i, a] - pos[a]) - c * kd_scale * vel[a]
+
+            seg_pos[i, a] = pos[a]
+            seg_vel[i, a] = vel[a]
+            seg_force[i, a] = u
+
+            if span > 0:
+                p00, p01, p10, p11 = _transition(params_arr[11 + a], params_arr[14 + a], span)
+                x_eq = u / k
+                dx = pos[a] - x_eq
+                pos[a] = p00 * dx + p01 * vel[a] + x_eq
+                vel[a] = p10 * dx + p11 * vel[a]
+
+    return seg_pos, seg_vel, seg_force
+
 class DigitalTwin:
     """Цифровой двойник 3D принтера"""
     
     def __init__(self, params: PrinterParams):
         self.params = params
         
-        # Состояние системы [x, x_dot, y, y_dot, z, z_dot]
-        self.state = np.zeros(6)
+        # Состояние системы: позиции [x, y, z] и скорости [x_dot, y_dot, z_dot]
+        self.pos = np.zeros(3)
+        self.vel = np.zeros(3)
         
         # История для анализа
         self.history = {
-            'time': [],
-            'position': [],
-            'velocity': [],
-            'acceleration': [],
-            'error': []
+            'time': np.empty(0),
+            'position': np.empty((0, 3)),
+            'velocity': np.empty((0, 3)),
+            'acceleration': np.empty((0, 3)),
+            'error': np.empty((0, 3))
         }
         
         # Модель люфта
@@ -67,52 +218,80 @@ class DigitalTwin:
         self.backlash_comp_x = 0
         self.backlash_comp_y = 0
         
-    def dynamics(self, t: float, state: np.ndarray, 
+    def dynamics(self, pos: np.ndarray, vel: np.ndarray,
                  u: np.ndarray) -> np.ndarray:
-        """Уравнения динамики принтера (3 оси)"""
-        # u = [F_x, F_y, F_z] - управляющие силы
-        
-        # Извлечение состояния
-        x, xd, y, yd, z, zd = state
+        """
+        Уравнения динамики принтера (3 оси)
         
-        # Уравнения для оси X
-        F_x = u[0] if len(u) > 0 else 0
-        xdd = (F_x - self.params.c_x * xd - self.params.k_x * x) / self.params.mass_x
+        Args:
+            pos: Позиции [x, y, z] или массив (N, 3)
+            vel: Скорости [x_dot, y_dot, z_dot] той же формы
+            u: Управляющие силы [F_x, F_y, F_z] той же формы
         
-        # Уравнения для оси Y
-        F_y = u[1] if len(u) > 1 else 0
-        ydd = (F_y - self.params.c_y * yd - self.params.k_y * y) / self.params.mass_y
+        Returns:
+            Ускорения [x_ddot, y_ddot, z_ddot] той же формы
+        """
+        params_arr = _pack_params(self.params)
         
-        # Уравнения для оси Z
-        F_z = u[2] if len(u) > 2 else 0
-        zdd = (F_z - self.params.c_z * zd - self.params.k_z * z) / self.params.mass_z
+        # Тип результата совпадает с типом состояния
+        dtype = np.result_type(pos, vel)
+        mass = params_arr[0:9:3].astype(dtype)
+        damping = params_arr[1:9:3].astype(dtype)
+        stiffness = params_arr[2:9:3].astype(dtype)
         
-        return np.array([xd, xdd, yd, ydd, zd, zdd])
+        return (u - damping * vel - stiffness * pos) / mass
     
     def apply_backlash(self, target_pos: np.ndarray, 
                        current_pos: np.ndarray) -> np.ndarray:
-        """Моделирование люфта в механике"""
+        """
+        Моделирование люфта в механике для последовательности целей
+        
+        Направление движения к каждой цели определяется по смещению от
+        предыдущей цели (для первой - от current_pos). При смене
+        направления к цели добавляется люфт.
+        
+        Args:
+            target_pos: Целевые позиции, массив (N, 3)
+            current_pos: Текущая позиция [x, y, z]
+        """
         compensated = target_pos.copy()
+        n = len(target_pos)
+        if n == 0:
+            return compensated
         
-        # Ось X
-        dx = target_pos[0] - current_pos[0]
-        if abs(dx) > 0.001:  # Порог движения
-            dir_x = 1 if dx > 0 else -1
-            if dir_x != self.last_dir_x:
-                # Смена направления - учитываем люфт
-                compensated[0] += dir_x * self.params.backlash_x
-                self.last_dir_x = dir_x
-        
-        # Ось Y
-        dy = target_pos[1] - current_pos[1]
-        if abs(dy) > 0.001:
-            dir_y = 1 if dy > 0 else -1
-            if dir_y != self.last_dir_y:
-                compensated[1] += dir_y * self.params.backlash_y
-                self.last_dir_y = dir_y
-                
+        index = np.arange(n)
+        axes = (
+            (0, self.last_dir_x, self.params.backlash_x),  # Ось X
+            (1, self.last_dir_y, self.params.backlash_y),  # Ось Y
+        )
+        last_dirs = []
+        for axis, last_dir, backlash in axes:
+            d = np.diff(target_pos[:, axis], prepend=current_pos[axis])
+            direction = np.sign(d) * (np.abs(d) > 0.001)  # Порог движения
+            
+            # Направление сохраняется, пока ось стоит на месте
+            last_moved = np.maximum.accumulate(np.where(direction != 0, index, -1))
+            held = np.where(last_moved >= 0, direction[last_moved], last_dir)
+            previous = np.concatenate(([last_dir], held[:-1]))
+            
+            # Смена направления - учитываем люфт
+            compensated[:, axis] += held * backlash * (held != previous)
+            last_dirs.append(int(held[-1]))
+        
+        self.last_dir_x, self.last_dir_y = last_dirs
         return compensated
     
+    @staticmethod
+    def sample_counts(trajectory: np.ndarray, dt: float = 0.001) -> np.ndarray:
+        """
+        Число отсчетов simulate_movement на каждом интервале траектории
+        
+        Интервал дискретизируется шагом <= dt и включает обе свои
+        границы, поэтому отсчет стыка интервалов повторяется.
+        """
+        spans = np.diff(np.asarray(trajectory, dtype=np.float64)[:, 0])
+        return np.ceil(np.maximum(spans, 0.0) / dt).astype(np.int64) + 1
+    
     def simulate_movement(self, trajectory: np.ndarray, 
                           dt: float = 0.001) -> Dict:
         """
@@ -122,92 +301,100 @@ class DigitalTwin:
             trajectory: Массив [time, target_x, target_y, target_z]
             dt: Шаг симуляции
         """
-        results = {
-            'time': [],
-            'target_pos': [],
-            'actual_pos': [],
-            'velocity': [],
-            'acceleration': [],
-            'tracking_error': []
-        }
+        trajectory = np.ascontiguousarray(trajectory, dtype=np.float64)
+        if trajectory.ndim != 2 or len(trajectory) < 2:
+            return {
+                'time': np.empty(0),
+                'target_pos': np.empty((0, 3), dtype=SAMPLE_DTYPE),
+                'actual_pos': np.empty((0, 3), dtype=SAMPLE_DTYPE),
+                'velocity': np.empty((0, 3), dtype=SAMPLE_DTYPE),
+                'acceleration': np.empty((0, 3), dtype=SAMPLE_DTYPE),
+                'tracking_error': np.empty((0, 3), dtype=SAMPLE_DTYPE)
+            }
         
-        current_state = self.state.copy()
-        current_time = 0
+        params_arr = _pack_params(self.params)
         
-        for i in range(len(trajectory) - 1):
-            t_start, x_t, y_t, z_t = trajectory[i]
-            t_end, x_next, y_next, z_next = trajectory[i + 1]
-            
-            # Целевая позиция с учетом люфта
-            target_pos = np.array([x_t, y_t, z_t])
-            compensated_target = self.apply_backlash(
-                target_pos, current_state[[0, 2, 4]]
-            )
-            
-            # Простая ПИД-имитация для расчета управляющей силы
-            Kp = np.array([self.params.k_x, self.params.k_y, self.params.k_z]) * 0.1
-            Kd = np.array([self.params.c_x, self.params.c_y, self.params.c_z]) * 0.05
-            
-            error = compensated_target - current_state[[0, 2, 4]]
-            error_derivative = -current_state[[1, 3, 5]]
-            
-            # Управляющее воздействие (сила)
-            u = Kp * error + Kd * error_derivative
-            
-            # Интегрирование динамики
-            t_span = (t_start, t_end)
-            sol = solve_ivp(
-                lambda t, s: self.dynamics(t, s, u),
-                t_span,
-                current_state,
-                max_step=dt,
-                rtol=1e-6,
-                atol=1e-9
-            )
-            
-            # Сохранение результатов
-            for j in range(len(sol.t)):
-                results['time'].append(sol.t[j])
-                results['target_pos'].append([x_t, y_t, z_t])
-                results['actual_pos'].append(sol.y[[0, 2, 4], j])
-                results['velocity'].append(sol.y[[1, 3, 5], j])
-                results['tracking_error'].append(
-                    np.array([x_t, y_t, z_t]) - sol.y[[0, 2, 4], j]
-                )
-            
-            current_state = sol.y[:, -1]
-            current_time = t_end
+        # Цели сегментов с учетом люфта для всей траектории сразу
+        targets = self.apply_backlash(trajectory[:-1, 1:4], self.pos)
+        seg_pos, seg_vel, seg_force = _simulate_njit(
+            trajectory, targets, self.pos, self.vel, params_arr
+        )
         
-        # Расчет ускорений (только если есть данные)
-        if len(results['velocity']) > 1:
-            velocities = np.array(results['velocity'])
-            times = np.array(results['time'])
-            
-            # Для каждой оси отдельно
-            accels = []
-            for axis in range(velocities.shape[1]):
-                axis_vel = velocities[:, axis]
-                axis_accel = np.gradient(axis_vel, times)
-                accels.append(axis_accel)
-            
-            results['acceleration'] = np.column_stack(accels)
-        else:
-            results['acceleration'] = []
+        # Сетка отсчетов: каждый сегмент дискретизирован шагом <= dt
+        # и включает свою начальную точку
+        spans = np.diff(trajectory[:, 0])
+        counts = self.sample_counts(trajectory, dt)
+        n_steps = counts - 1
+        h = np.divide(spans, n_steps, out=np.zeros_like(spans), where=n_steps > 0)
+        seg = np.repeat(np.arange(len(spans)), counts)
+        offsets = np.cumsum(counts) - counts
+        tau = (np.arange(len(seg)) - offsets[seg]) * h[seg]
+        
+        # Выходные массивы выделяются один раз под точное число отсчетов
+        n_samples = len(seg)
+        times = np.empty(n_samples)
+        target_pos = np.empty((n_samples, 3), dtype=SAMPLE_DTYPE)
+        actual_pos = np.empty((n_samples, 3), dtype=SAMPLE_DTYPE)
+        velocity = np.empty((n_samples, 3), dtype=SAMPLE_DTYPE)
+        tracking_error = np.empty((n_samples, 3), dtype=SAMPLE_DTYPE)
+        
+        np.add(trajectory[seg, 0], tau, out=times)
+        np.take(trajectory[:, 1:4].astype(SAMPLE_DTYPE), seg, axis=0, out=target_pos)
+        
+        # Состояние во всех отсчетах сразу: Phi(tau) от начала сегмента
+        # Phi(tau) вычисляется в float64, в выходные массивы пишется SAMPLE_DTYPE
+        omega0 = params_arr[11:14]
+        zeta = params_arr[14:17]
+        stiffness = params_arr[2:9:3]
+        x_eq = (seg_force / stiffness)[seg]
+        dx = seg_pos[seg]
+        dx -= x_eq
+        v0 = seg_vel[seg]
+        for axis in range(3):
+            # x = p00*dx + p01*v0 + x_eq, xd = p10*dx + p11*v0
+            # Коэффициенты Phi(tau) создаются заново для каждой оси,
+            # поэтому произведения считаются на их месте без временных массивов
+            p00, p01, p10, p11 = _transition(omega0[axis], zeta[axis], tau)
+            p00 *= dx[:, axis]
+            p01 *= v0[:, axis]
+            p10 *= dx[:, axis]
+            p11 *= v0[:, axis]
+            np.add(p00, p01, out=actual_pos[:, axis])
+            actual_pos[:, axis] += x_eq[:, axis]
+            np.add(p10, p11, out=velocity[:, axis])
+        
+        np.subtract(target_pos, actual_pos, out=tracking_error)
+        
+        # Ускорения прямо из уравнений динамики: xdd = (F - c*xd - k*x) / m
+        acceleration = self.dynamics(actual_pos, velocity,
+                                     seg_force.astype(SAMPLE_DTYPE)[seg])
         
-        return results
+        return {
+            'time': times,
+            'target_pos': target_pos,
+            'actual_pos': actual_pos,
+            'velocity': velocity,
+            'acceleration': acceleration,
+            'tracking_error': tracking_error
+        }
     
     def predict_vibration(self, movement_data: dict) -> Dict:
         """Предсказание вибраций на основе модели"""
-        time_data = np.array(movement_data['time'])
-        accel_data = np.array(movement_data['acceleration'])
+        time_data = movement_data.get('time')
+        accel_data = movement_data.get('acceleration')
         
-        if len(time_data) <= 1 or len(accel_data) == 0:
+        # Вырожденные данные отсекаются до создания массивов
+        if (time_data is None or accel_data is None or
+                len(time_data) <= 1 or len(accel_data) == 0):
             return {
                 'resonance_excitation': {'x': 0, 'y': 0},
                 'vibration_score': 0,
                 'dominant_frequency': 0
             }
         
+        time_data = np.asarray(time_data)
+        accel_data = np.asarray(accel_data)
+        
         # Преобразование Фурье для анализа частот
         dt = time_data[1] - time_data[0]
         n = len(time_data)
@@ -215,26 +402,32 @@ class DigitalTwin:
         # Проверяем размерность ускорений
         if accel_data.ndim == 1:
             # Одно измерение
-            fft_result = np.fft.fft(accel_data)
+            signal = np.ascontiguousarray(accel_data, dtype=np.float64)
         else:
             # Несколько осей, берем первую
-            fft_result = np.fft.fft(accel_data[:, 0])
-        
-        freqs = np.fft.fftfreq(n, dt)
+            signal = np.ascontiguousarray(accel_data[:, 0], dtype=np.float64)
         
-        # Нахождение амплитуд на резонансных частотах
+        # Нахождение амплитуд на резонансных частотах (фильтр Герцеля)
         resonance_amp_x = 0
         resonance_amp_y = 0
         
         if self.params.resonance_freq_x > 0:
-            resonance_idx_x = np.argmin(np.abs(freqs - self.params.resonance_freq_x))
-            if resonance_idx_x < len(fft_result):
-                resonance_amp_x = np.abs(fft_result[resonance_idx_x]) / n
+            resonance_amp_x = _goertzel(signal, 1.0 / dt, self.params.resonance_freq_x)
         
         if self.params.resonance_freq_y > 0:
-            resonance_idx_y = np.argmin(np.abs(freqs - self.params.resonance_freq_y))
-            if resonance_idx_y < len(fft_result):
-                resonance_amp_y = np.abs(fft_result[resonance_idx_y]) / n
+            resonance_amp_y = _goertzel(signal, 1.0 / dt, self.params.resonance_freq_y)
+        
+        # Доминирующая частота по спектру вещественного сигнала,
+        # длина дополняется до быстрой для FFT
+        # SciPy импортируется при первом вызове: калибровка и загрузка
+        # параметров не должны платить за его загрузку
+        from scipy.fft import rfft, next_fast_len
+        
+        m = next_fast_len(n, real=True)
+        magnitudes = np.abs(rfft(signal, n=m, workers=-1))
+        
+        # Частота бина k равна k / (m * dt), массив частот не нужен
+        dominant_frequency = int(np.argmax(magnitudes)) / (m * dt)
         
         return {
             'resonance_excitation': {
@@ -242,14 +435,15 @@ class DigitalTwin:
                 'y': float(resonance_amp_y)
             },
             'vibration_score': float(resonance_amp_x + resonance_amp_y),
-            'dominant_frequency': float(freqs[np.argmax(np.abs(fft_result))])
+            'dominant_frequency': float(dominant_frequency)
         }
     
     def calculate_quality_metrics(self, simulation_results: Dict) -> Dict:
         """Расчет метрик качества печати"""
-        tracking_error = np.array(simulation_results['tracking_error'])
+        tracking_error = simulation_results.get('tracking_error')
         
-        if len(tracking_error) == 0:
+        # Пустая симуляция отсекается до создания массивов
+        if tracking_error is None or len(tracking_error) == 0:
             return {
                 'overall_score': 0,
                 'tracking_score': 0,
@@ -259,11 +453,16 @@ class DigitalTwin:
                 'resonance_excitation': {'x': 0, 'y': 0}
             }
         
-        # RMS ошибка слежения
-        rms_error = np.sqrt(np.mean(tracking_error**2))
+        tracking_error = np.asarray(tracking_error)
+        flat = tracking_error.ravel()
+        
+        # RMS ошибка слежения: сумма квадратов без промежуточного массива,
+        # накопление в float64
+        sq_sum = np.einsum('i,i->', flat, flat, dtype=np.float64)
+        rms_error = math.sqrt(sq_sum / flat.size)
         
-        # Максимальная ошибка
-        max_error = np.max(np.abs(tracking_error))
+        # Максимальная ошибка по модулю без копии np.abs
+        max_error = max(flat.max(), -flat.min())
         
         # Вибрационный анализ
         vibration_data = self.predict_vibration(simulation_results)
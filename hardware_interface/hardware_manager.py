@@ -2,13 +2,18 @@
 Hardware manager for coordinating multiple hardware interfaces
 """
 
+import logging
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from .tmc2209_driver import TMC2209Driver, TMC2209Config
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
 class HardwareStatus:
     """Current status of hardware system"""
     connected: bool
@@ -29,10 +34,14 @@ class HardwareManager:
             drivers={},
             sensors={},
             temperatures={},
-            errors=[],
+            errors=deque(maxlen=10),  # Keeps only the latest errors
             timestamp=time.time()
         )
-        self.lock = threading.RLock()
+        self.lock = threading.Lock()
+        # Snapshot returned by get_status; only fields marked dirty are
+        # copied when it is rebuilt, the rest are shared with the old one
+        self._status_snapshot: Optional[HardwareStatus] = None
+        self._status_dirty_fields = set()
         self.monitor_thread = None
         self.running = False
         
@@ -46,51 +55,61 @@ class HardwareManager:
             
             if driver.connect():
                 if driver.setup_driver(config):
-                    self.drivers[name] = driver
+                    # Copy-on-write: readers see either the old or the new dict
+                    drivers = dict(self.drivers)
+                    drivers[name] = driver
+                    self.drivers = drivers
                     self.status.drivers[name] = True
-                    print(f"✅ Driver {name} connected on {port}")
+                    self._status_dirty_fields.add('drivers')
+                    logger.info("Driver %s connected on %s", name, port)
                     return True
                 else:
-                    print(f"❌ Failed to setup driver {name}")
+                    logger.warning("Failed to setup driver %s", name)
                     driver.disconnect()
             else:
-                print(f"❌ Failed to connect to driver {name} on {port}")
+                logger.warning("Failed to connect to driver %s on %s", name, port)
         
         return False
     
     def remove_driver(self, name: str):
         """Remove a driver"""
         with self.lock:
-            if name in self.drivers:
-                self.drivers[name].disconnect()
-                del self.drivers[name]
-                if name in self.status.drivers:
-                    del self.status.drivers[name]
-                print(f"Driver {name} removed")
+            self._remove_driver_locked(name)
+    
+    def _remove_driver_locked(self, name: str):
+        """Remove a driver; caller must hold self.lock"""
+        if name in self.drivers:
+            drivers = dict(self.drivers)
+            drivers.pop(name).disconnect()
+            self.drivers = drivers
+            if name in self.status.drivers:
+                del self.status.drivers[name]
+                self._status_dirty_fields.add('drivers')
+            logger.info("Driver %s removed", name)
     
     def get_driver(self, name: str) -> Optional[TMC2209Driver]:
-        """Get driver by name"""
+        """Get driver by name (lock-free, self.drivers is replaced atomically)"""
         return self.drivers.get(name)
     
     def get_all_driver_status(self) -> Dict[str, Dict[str, Any]]:
         """Get status for all drivers"""
         status = {}
-        with self.lock:
-            for name, driver in self.drivers.items():
-                try:
-                    drv_status = driver.read_drv_status()
-                    status[name] = {
-                        'connected': True,
-                        'status': drv_status,
-                        'stallguard': drv_status.get('stallguard', 0),
-                        'cs_actual': drv_status.get('cs_actual', 0),
-                        'standstill': drv_status.get('stst', 0) == 1
-                    }
-                except Exception as e:
-                    status[name] = {
-                        'connected': False,
-                        'error': str(e)
-                    }
+        drivers = self.drivers
+        for name, driver in drivers.items():
+            try:
+                drv_status = driver.read_drv_status()
+                status[name] = {
+                    'connected': True,
+                    'status': drv_status,
+                    'stallguard': drv_status.get('stallguard', 0),
+                    'cs_actual': drv_status.get('cs_actual', 0),
+                    'standstill': drv_status.get('stst', 0) == 1
+                }
+            except Exception as e:
+                status[name] = {
+                    'connected': False,
+                    'error': str(e)
+                }
         
         return status
     
@@ -105,43 +124,64 @@ class HardwareManager:
             'z': 'z_driver'
         }
         
+        drivers = self.drivers
+        axis_drivers = {}
         for axis, driver_name in axis_map.items():
-            if driver_name in self.drivers:
-                driver = self.drivers[driver_name]
+            if driver_name in drivers:
+                axis_drivers[axis] = drivers[driver_name]
+            else:
+                logger.warning("No driver found for %s-axis", axis)
+        
+        if not axis_drivers:
+            return results
+        
+        # Each driver owns its serial port, so the sweeps run concurrently
+        with ThreadPoolExecutor(max_workers=len(axis_drivers)) as executor:
+            futures = {}
+            for axis, driver in axis_drivers.items():
+                logger.info("Measuring resonance for %s-axis...", axis)
+                futures[axis] = executor.submit(
+                    driver.measure_resonance,
+                    axis=axis,
+                    frequency_range=(20, 100),
+                    steps=15
+                )
+            
+            for axis, future in futures.items():
                 try:
-                    print(f"Measuring resonance for {axis}-axis...")
-                    results[axis] = driver.measure_resonance(
-                        axis=axis,
-                        frequency_range=(20, 100),
-                        steps=15
-                    )
-                    print(f"  Found {len(results[axis].get('resonance_peaks', []))} peaks")
+                    results[axis] = future.result()
+                    logger.info("%s: found %d peaks", axis,
+                                len(results[axis].get('resonance_peaks', [])))
                 except Exception as e:
-                    print(f"  Failed to measure {axis} resonance: {e}")
+                    logger.warning("Failed to measure %s resonance: %s", axis, e)
                     results[axis] = {'error': str(e)}
-            else:
-                print(f"  No driver found for {axis}-axis")
         
         return results
     
     def auto_tune_all_currents(self, target_temp: float = 50.0) -> Dict[str, float]:
         """Auto-tune currents for all drivers"""
         currents = {}
+        drivers = self.drivers
         
-        for name, driver in self.drivers.items():
-            try:
-                print(f"Auto-tuning current for {name}...")
-                optimal_current = driver.auto_tune_current(target_temp)
-                currents[name] = optimal_current
-                
-                # Update driver config
-                driver.config.current = optimal_current
-                driver.setup_driver(driver.config)
-                
-                print(f"  Optimal current: {optimal_current:.2f}A")
-            except Exception as e:
-                print(f"  Failed to tune {name}: {e}")
-                currents[name] = driver.config.current
+        if not drivers:
+            return currents
+        
+        # Each driver owns its serial port, so tuning runs concurrently
+        with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+            futures = {}
+            for name, driver in drivers.items():
+                logger.info("Auto-tuning current for %s...", name)
+                # auto_tune_current leaves the driver configured at the optimum
+                futures[name] = executor.submit(driver.auto_tune_current, target_temp)
+            
+            for name, future in futures.items():
+                try:
+                    optimal_current = future.result()
+                    currents[name] = optimal_current
+                    logger.info("%s: optimal current %.2fA", name, optimal_current)
+                except Exception as e:
+                    logger.warning("Failed to tune %s: %s", name, e)
+                    currents[name] = drivers[name].config.current
         
         return currents
     
@@ -155,7 +195,7 @@ class HardwareManager:
                 daemon=True
             )
             self.monitor_thread.start()
-            print("Hardware monitoring started")
+            logger.info("Hardware monitoring started")
     
     def stop_monitoring(self):
         """Stop background monitoring"""
@@ -163,64 +203,114 @@ class HardwareManager:
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2.0)
             self.monitor_thread = None
-            print("Hardware monitoring stopped")
+            logger.info("Hardware monitoring stopped")
     
     def _monitor_loop(self, interval: float):
         """Background monitoring loop"""
+        # Schedule ticks on the monotonic clock so the cadence does not
+        # drift with the time spent polling drivers
+        next_tick = time.monotonic() + interval
         while self.running:
             try:
+                # self.drivers is copy-on-write, so the snapshot needs no lock;
+                # serial reads run without the manager lock, each driver
+                # serializes its own UART transactions
+                drivers_snapshot = list(self.drivers.items())
+                
+                new_drv_state = {}
+                new_errors = []
+                
+                # Update driver status
+                for name, driver in drivers_snapshot:
+                    try:
+                        status = driver.poll_status()
+                        new_drv_state[name] = True
+                        
+                        # Check for errors
+                        if status.get('ot', 0) == 1:
+                            new_errors.append(f"{name}: Overtemperature")
+                        if status.get('ola', 0) == 1 or status.get('olb', 0) == 1:
+                            new_errors.append(f"{name}: Open load detected")
+                        
+                    except Exception as e:
+                        new_drv_state[name] = False
+                        new_errors.append(f"{name}: Connection error - {str(e)}")
+                
+                # Publish results
                 with self.lock:
-                    # Update driver status
-                    for name, driver in self.drivers.items():
-                        try:
-                            status = driver.read_drv_status()
-                            self.status.drivers[name] = True
-                            
-                            # Check for errors
-                            if status.get('ot', 0) == 1:
-                                self.status.errors.append(f"{name}: Overtemperature")
-                            if status.get('ola', 0) == 1 or status.get('olb', 0) == 1:
-                                self.status.errors.append(f"{name}: Open load detected")
-                            
-                        except Exception as e:
-                            self.status.drivers[name] = False
-                            self.status.errors.append(f"{name}: Connection error - {str(e)}")
+                    # Skip drivers removed while their status was being read
+                    for name, state in new_drv_state.items():
+                        if name in self.drivers and self.status.drivers.get(name) is not state:
+                            self.status.drivers[name] = state
+                            self._status_dirty_fields.add('drivers')
+                    if new_errors:
+                        self.status.errors.extend(new_errors)
+                        self._status_dirty_fields.add('errors')
                     
                     # Update overall status
                     self.status.connected = any(self.status.drivers.values())
                     self.status.timestamp = time.time()
-                    
-                    # Clear old errors
-                    if len(self.status.errors) > 10:
-                        self.status.errors = self.status.errors[-10:]
-                
-                time.sleep(interval)
+                    self._status_dirty_fields.add('timestamp')
                 
             except Exception as e:
-                print(f"Monitoring error: {e}")
-                time.sleep(interval)
+                logger.error("Monitoring error: %s", e)
+            
+            now = time.monotonic()
+            sleep_for = next_tick - now
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+            next_tick += interval
+            if sleep_for < -interval:
+                # Skip missed ticks instead of running them in a burst
+                next_tick = now + interval
     
     def get_status(self) -> HardwareStatus:
-        """Get current hardware status"""
+        """
+        Get current hardware status
+        
+        Returns a caller-owned copy with plain dict/list containers. The
+        internal snapshot it is copied from is rebuilt only for fields
+        changed since the last call and is never mutated in place.
+        """
         with self.lock:
-            return HardwareStatus(
-                connected=self.status.connected,
-                drivers=self.status.drivers.copy(),
-                sensors=self.status.sensors.copy(),
-                temperatures=self.status.temperatures.copy(),
-                errors=self.status.errors.copy(),
-                timestamp=self.status.timestamp
-            )
+            snapshot = self._status_snapshot
+            dirty = self._status_dirty_fields
+            
+            if snapshot is None or dirty:
+                # Copy only changed containers, share the rest
+                status = self.status
+                changed = (lambda field: True) if snapshot is None else dirty.__contains__
+                snapshot = HardwareStatus(
+                    connected=status.connected,
+                    drivers=status.drivers.copy() if changed('drivers') else snapshot.drivers,
+                    sensors=status.sensors.copy() if changed('sensors') else snapshot.sensors,
+                    temperatures=(status.temperatures.copy()
+                                  if changed('temperatures') else snapshot.temperatures),
+                    errors=list(status.errors) if changed('errors') else snapshot.errors,
+                    timestamp=status.timestamp
+                )
+                self._status_snapshot = snapshot
+                dirty.clear()
+        
+        # The snapshot is replaced, never mutated, so it is copied outside the lock
+        return HardwareStatus(
+            connected=snapshot.connected,
+            drivers=dict(snapshot.drivers),
+            sensors=dict(snapshot.sensors),
+            temperatures=dict(snapshot.temperatures),
+            errors=list(snapshot.errors),
+            timestamp=snapshot.timestamp
+        )
     
     def emergency_stop(self):
         """Emergency stop all drivers"""
-        print("🛑 EMERGENCY STOP triggered")
+        logger.warning("EMERGENCY STOP triggered")
         with self.lock:
             for name, driver in self.drivers.items():
                 try:
                     # Disable driver
                     driver.write_register(driver.REG_GCONF, 0)
-                    print(f"  {name}: Driver disabled")
+                    logger.warning("%s: Driver disabled", name)
                 except:
                     pass
     
@@ -229,6 +319,6 @@ class HardwareManager:
         self.stop_monitoring()
         with self.lock:
             for name in list(self.drivers.keys()):
-                self.remove_driver(name)
+                self._remove_driver_locked(name)
         
-        print("Hardware manager cleaned up")
\ No newline at end of file
+        logger.info("Hardware manager cleaned up")
\ No newline at end of file
@@ -1,10 +1,39 @@
 import serial
 import time
+import logging
+import math
+import random
 from dataclasses import dataclass
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Sequence
 import struct
+import threading
 import numpy as np  # Добавлен импорт
 
+logger = logging.getLogger(__name__)
+
+def _crc8(byte: int) -> int:
+    """CRC8 (полином 0x07) одного байта - побитовый расчет"""
+    crc = byte
+    for _ in range(8):
+        if crc & 0x80:
+            crc = (crc << 1) ^ 0x07
+        else:
+            crc <<= 1
+        crc &= 0xFF
+    return crc
+
+# Таблица CRC8 для всех значений байта: crc = CRC8_TABLE[crc ^ byte]
+CRC8_TABLE = bytes(_crc8(i) for i in range(256))
+
+# Кодеки пакетов UART (big-endian)
+_PKT_WRITE = struct.Struct('>BBBI')  # [Sync, Address, Register, Data]
+_PKT_READ = struct.Struct('>BBBB')   # [Sync, Address, Register, 0]
+_U32 = struct.Struct('>I')
+
+# До этого числа точек развертка резонанса считается на чистом Python:
+# накладные расходы NumPy/SciPy больше самой работы
+SMALL_SWEEP_STEPS = 32
+
 @dataclass
 class TMC2209Config:
     """Конфигурация драйвера TMC2209"""
@@ -43,12 +72,46 @@ class TMC2209Driver:
     REG_DRV_STATUS = 0x6F
     REG_PWMCONF = 0x70
     
+    # Кодирование микрошагов в поле MRES (CHOPCONF)
+    _MRES_MAP = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6, 128: 7, 256: 8}
+    
+    # Поля DRV_STATUS: (имя, сдвиг, маска)
+    _STATUS_FIELDS = (
+        ('stallguard', 24, 0xFF),
+        ('cs_actual', 16, 0x1F),
+        ('fullsteps_active', 15, 0x1),
+        ('stst', 0, 0x1),   # Standstill detected
+        ('olb', 1, 0x1),    # Open load B
+        ('ola', 2, 0x1),    # Open load A
+        ('s2gb', 3, 0x1),   # Short to ground B
+        ('s2ga', 4, 0x1),   # Short to ground A
+        ('ot', 5, 0x1),     # Overtemperature
+        ('otpw', 6, 0x1),   # Overtemperature pre-warning
+    )
+    
     def __init__(self, port: str, baudrate: int = 115200):
         self.port = port
         self.baudrate = baudrate
         self.serial = None
         self.config = TMC2209Config()
         
+        # Транзакция UART (запрос и ответ) атомарна: мониторинг, API и
+        # автонастройка работают с одним портом из разных потоков
+        self._io_lock = threading.Lock()
+        
+        # Кэш неизменяемых пакетов чтения и CRC префикса [Sync, Address, Register]
+        # для пакетов записи; ключ - (адрес, регистр)
+        self._read_packet_cache: Dict[Tuple[int, int], bytes] = {}
+        self._write_prefix_crc: Dict[Tuple[int, int], int] = {}
+        
+        # Теневая копия CHOPCONF: setup_driver - единственный писатель,
+        # поэтому после первой записи регистр не нужно перечитывать
+        self._chopconf_shadow: Optional[int] = None
+        
+        # Готовый запрос DRV_STATUS для poll_status
+        self._drv_status_req = self.build_packet(self.config.uart_address,
+                                                 self.REG_DRV_STATUS, read=True)
+        
     def connect(self) -> bool:
         """Подключение к драйверу"""
         try:
@@ -61,79 +124,122 @@ class TMC2209Driver:
             
             # Проверка связи
             if self.read_register(self.REG_IOIN):
-                print(f"Connected to TMC2209 on {self.port}")
+                logger.info("Connected to TMC2209 on %s", self.port)
                 return True
         except Exception as e:
-            print(f"Connection failed: {e}")
+            logger.warning("Connection failed: %s", e)
         return False
     
     def disconnect(self):
         """Отключение"""
-        if self.serial:
-            self.serial.close()
-            self.serial = None
+        with self._io_lock:
+            if self.serial:
+                self.serial.close()
+                self.serial = None
+            self._chopconf_shadow = None
     
     def calculate_crc(self, data: bytes) -> int:
         """Расчет CRC8 для TMC2209"""
+        t = CRC8_TABLE
+        if len(data) == 4:
+            # Пакет чтения: развернутый расчет
+            return t[t[t[t[data[0]] ^ data[1]] ^ data[2]] ^ data[3]]
+        
         crc = 0
         for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = (crc << 1) ^ 0x07
-                else:
-                    crc <<= 1
-                crc &= 0xFF
+            crc = t[crc ^ byte]
         return crc
     
     def build_packet(self, address: int, register: int, 
                     data: int = 0, read: bool = False) -> bytes:
         """Построение пакета для UART"""
         sync = 0x05  # Sync byte
+        key = (address, register)
         
         if read:
-            # Read packet: [Sync, Address, Register, 0]
-            packet = bytes([sync, address, register, 0])
-        else:
-            # Write packet: [Sync, Address, Register, Data3, Data2, Data1, Data0]
-            data_bytes = data.to_bytes(4, 'big')
-            packet = bytes([sync, address, register]) + data_bytes
+            # Пакет чтения не зависит от данных - строим один раз
+            packet = self._read_packet_cache.get(key)
+            if packet is None:
+                # Read packet: [Sync, Address, Register, 0]
+                packet = _PKT_READ.pack(sync, address, register, 0)
+                
+                # Добавляем CRC
+                packet += bytes([self.calculate_crc(packet)])
+                self._read_packet_cache[key] = packet
+            return packet
         
-        # Добавляем CRC
-        crc = self.calculate_crc(packet)
-        packet += bytes([crc])
+        # Write packet: [Sync, Address, Register, Data3, Data2, Data1, Data0]
+        prefix_crc = self._write_prefix_crc.get(key)
+        if prefix_crc is None:
+            prefix_crc = self.calculate_crc(bytes([sync, address, register]))
+            self._write_prefix_crc[key] = prefix_crc
         
-        return packet
-    
-    def send_packet(self, packet: bytes) -> bytes:
-        """Отправка пакета и чтение ответа"""
-        if not self.serial:
-            return b''
+        packet = _PKT_WRITE.pack(sync, address, register, data)
         
-        self.serial.write(packet)
-        time.sleep(0.001)  # Задержка для ответа
+        # Добавляем CRC: продолжаем с состояния после префикса по 4 байтам данных
+        t = CRC8_TABLE
+        crc = t[t[t[t[prefix_crc ^ packet[3]] ^ packet[4]]
+                  ^ packet[5]] ^ packet[6]]
         
-        # Чтение ответа
-        response = self.serial.read(8)  # 8 байт для чтения
-        return response
+        return packet + bytes((crc,))
     
-    def read_register(self, register: int) -> Optional[int]:
-        """Чтение регистра"""
-        packet = self.build_packet(self.config.uart_address, 
-                                 register, read=True)
-        response = self.send_packet(packet)
+    def send_packet(self, packet: bytes, response_size: int = 8) -> bytes:
+        """Отправка пакета (или нескольких пакетов подряд) и чтение ответа"""
+        with self._io_lock:
+            if not self.serial:
+                return b''
+            
+            # Опоздавший ответ прошлой транзакции (пришел после дедлайна)
+            # отбрасывается, иначе все следующие ответы сдвинутся на один
+            self.serial.reset_input_buffer()
+            self.serial.write(packet)
+            
+            # Ожидание ответа: опрос буфера до дедлайна вместо фиксированной паузы
+            # и блокирующего read() с таймаутом порта (10 бит на байт по линии)
+            deadline = time.monotonic() + 0.01 + response_size * 10 / self.baudrate
+            while (self.serial.in_waiting < response_size
+                   and time.monotonic() < deadline):
+                time.sleep(0.0001)
+            
+            # Чтение ответа (8 байт на каждый запрос чтения)
+            return self.serial.read(min(self.serial.in_waiting, response_size))
+    
+    def read_registers(self, registers: Sequence[int]) -> List[Optional[int]]:
+        """
+        Пакетное чтение регистров
         
-        if len(response) >= 8:
-            # Проверка CRC
-            received_crc = response[-1]
-            calculated_crc = self.calculate_crc(response[:-1])
+        Все запросы отправляются одной записью в порт, ответы читаются
+        одним вызовом и разбираются по 8 байт с проверкой CRC. Пачка -
+        одна транзакция send_packet под блокировкой ввода-вывода драйвера.
+        
+        Args:
+            registers: Адреса регистров
+        
+        Returns:
+            Значения регистров (None для ответа с ошибкой)
+        """
+        address = self.config.uart_address
+        bulk = b''.join(self.build_packet(address, register, read=True)
+                        for register in registers)
+        response = self.send_packet(bulk, 8 * len(registers))
+        
+        values = []
+        for offset in range(0, 8 * len(registers), 8):
+            value = None
             
-            if received_crc == calculated_crc:
-                # Извлечение данных (байты 3-6)
-                data = int.from_bytes(response[3:7], 'big')
-                return data
+            if len(response) >= offset + 8:
+                # Проверка CRC
+                if response[offset + 7] == self.calculate_crc(response[offset:offset + 7]):
+                    # Извлечение данных (байты 3-6)
+                    value = _U32.unpack_from(response, offset + 3)[0]
+            
+            values.append(value)
         
-        return None
+        return values
+    
+    def read_register(self, register: int) -> Optional[int]:
+        """Чтение регистра"""
+        return self.read_registers((register,))[0]
     
     def write_register(self, register: int, value: int) -> bool:
         """Запись в регистр"""
@@ -147,6 +253,8 @@ class TMC2209Driver:
     def setup_driver(self, config: TMC2209Config) -> bool:
         """Настройка драйвера"""
         self.config = config
+        self._drv_status_req = self.build_packet(config.uart_address,
+                                                 self.REG_DRV_STATUS, read=True)
         
         try:
             # 1. Настройка GCONF
@@ -162,20 +270,16 @@ class TMC2209Driver:
             # 2. Настройка тока (IHOLD_IRUN)
             # IRUN (16-23 биты): ток работы (0-31 соответствует 0-2.5A)
             # IHOLD (0-4 биты): ток удержания
-            irun = int(config.current * 12.5)  # 0.08A per step
-            irun = min(max(irun, 1), 31)
-            ihold = max(irun // 2, 1)
-            
-            ihold_irun = (irun << 16) | (ihold << 0)
-            if not self.write_register(self.REG_IHOLD_IRUN, ihold_irun):
+            if not self._set_current(config.current):
                 return False
             
             # 3. Настройка микрошагов (CHOPCONF)
-            chopconf = self.read_register(self.REG_CHOPCONF) or 0
+            chopconf = self._chopconf_shadow
+            if chopconf is None:
+                chopconf = self.read_register(self.REG_CHOPCONF) or 0
             
             # Установка микрошагов (MRES: биты 24-27)
-            mres_map = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6, 128: 7, 256: 8}
-            mres = mres_map.get(config.microsteps, 4)  # По умолчанию 16 микрошагов
+            mres = self._MRES_MAP.get(config.microsteps, 4)  # По умолчанию 16 микрошагов
             
             chopconf &= ~(0xF << 24)  # Очищаем биты MRES
             chopconf |= (mres << 24)
@@ -185,6 +289,7 @@ class TMC2209Driver:
             
             if not self.write_register(self.REG_CHOPCONF, chopconf):
                 return False
+            self._chopconf_shadow = chopconf
             
             # 4. Настройка StallGuard (COOLCONF)
             if config.stallguard_threshold > 0:
@@ -199,31 +304,67 @@ class TMC2209Driver:
                 if not self.write_register(self.REG_TPWMTHRS, tpwmthrs):
                     return False
             
-            print(f"TMC2209 configured: {config.current}A, {config.microsteps}uSteps")
+            logger.debug("TMC2209 configured: %sA, %suSteps",
+                         config.current, config.microsteps)
             return True
             
         except Exception as e:
-            print(f"Setup error: {e}")
+            logger.error("Setup error: %s", e)
             return False
     
+    def _set_current(self, current: float) -> bool:
+        """Запись тока в IHOLD_IRUN без полной перенастройки драйвера"""
+        irun = int(current * 12.5)  # 0.08A per step
+        irun = min(max(irun, 1), 31)
+        ihold = max(irun // 2, 1)
+        
+        ihold_irun = (irun << 16) | (ihold << 0)
+        return self.write_register(self.REG_IHOLD_IRUN, ihold_irun)
+    
     def read_drv_status(self) -> Dict[str, Any]:
         """Чтение статуса драйвера"""
         status = self.read_register(self.REG_DRV_STATUS)
         if status is None:
             return {}
         
-        return {
-            'stallguard': (status >> 24) & 0xFF,
-            'cs_actual': (status >> 16) & 0x1F,
-            'fullsteps_active': (status >> 15) & 0x1,
-            'stst': (status >> 0) & 0x1,  # Standstill detected
-            'olb': (status >> 1) & 0x1,   # Open load B
-            'ola': (status >> 2) & 0x1,   # Open load A
-            's2gb': (status >> 3) & 0x1,  # Short to ground B
-            's2ga': (status >> 4) & 0x1,  # Short to ground A
-            'ot': (status >> 5) & 0x1,    # Overtemperature
-            'otpw': (status >> 6) & 0x1,  # Overtemperature pre-warning
-        }
+        return {key: (status >> shift) & mask
+                for key, shift, mask in self._STATUS_FIELDS}
+    
+    def poll_status(self) -> Dict[str, Any]:
+        """
+        Быстрый опрос DRV_STATUS для цикла мониторинга
+        
+        То же, что read_drv_status, но с готовым пакетом запроса и
+        встроенными проверкой CRC и разбором ответа.
+        """
+        with self._io_lock:
+            port = self.serial
+            if not port:
+                return {}
+            
+            # Как в send_packet: опоздавший ответ не должен сдвинуть опрос
+            port.reset_input_buffer()
+            port.write(self._drv_status_req)
+            
+            deadline = time.monotonic() + 0.01 + 80 / self.baudrate
+            while port.in_waiting < 8 and time.monotonic() < deadline:
+                time.sleep(0.0001)
+            
+            resp = port.read(min(port.in_waiting, 8))
+        
+        if len(resp) < 8:
+            return {}
+        
+        # Проверка CRC по байтам 0-6
+        t = CRC8_TABLE
+        crc = t[t[t[t[t[t[t[resp[0]] ^ resp[1]] ^ resp[2]] ^ resp[3]]
+                      ^ resp[4]] ^ resp[5]] ^ resp[6]]
+        if resp[7] != crc:
+            return {}
+        
+        status = _U32.unpack_from(resp, 3)[0]
+        return {key: (status >> shift) & mask
+                for key, shift, mask in self._STATUS_FIELDS}
     
     def measure_resonance(self, axis: str = 'x', 
                          frequency_range: Tuple[float, float] = (10, 100),
@@ -236,7 +377,7 @@ class TMC2209Driver:
             frequency_range: Диапазон частот (Гц)
             steps: Количество шагов измерения
         """
-        print(f"Measuring resonance for {axis}-axis...")
+        logger.info("Measuring resonance for %s-axis...", axis)
         
         results = {
             'frequencies': [],
@@ -244,46 +385,75 @@ class TMC2209Driver:
             'resonance_peaks': []
         }
         
-        # Генерация частот
-        freqs = np.linspace(frequency_range[0], frequency_range[1], steps)
+        # В реальной системе для каждой частоты была бы команда движения
+        # и чтение StallGuard:
+        # status = self.read_drv_status()
+        # sg_value = status.get('stallguard', 0)
+        # Для прототипа вся развертка симулируется одним выражением,
+        # поэтому пауза на каждую частоту не нужна
+        
+        # Симуляция: пик на 45 Гц для оси X, 38 Гц для оси Y
+        if axis == 'x':
+            amplitude, center, width = 100, 45, 50
+        else:
+            amplitude, center, width = 80, 38, 40
         
-        for freq in freqs:
-            # В реальной системе здесь была бы команда движения
-            # Для прототипа симулируем чтение StallGuard
-            time.sleep(0.05)
+        if steps < SMALL_SWEEP_STEPS:
+            # Короткая развертка: списки, math и random
+            f_start, f_stop = frequency_range
+            f_step = (f_stop - f_start) / (steps - 1) if steps > 1 else 0.0
+            freqs = [f_start + i * f_step for i in range(steps)]
+            if steps > 1:
+                freqs[-1] = float(f_stop)
             
-            # Считываем значение StallGuard (симулируем)
-            # В реальной системе здесь было бы:
-            # status = self.read_drv_status()
-            # sg_value = status.get('stallguard', 0)
+            sg_raw = [amplitude * math.exp(-((freq - center)**2) / width)
+                      + random.gauss(0, 5)  # Добавляем шум
+                      for freq in freqs]
+            sg_values = [max(0.0, sg) for sg in sg_raw]
             
-            # Симуляция: пик на 45 Гц для оси X, 38 Гц для оси Y
-            if axis == 'x':
-                sg_value = 100 * np.exp(-((freq - 45)**2) / 50)
-            else:
-                sg_value = 80 * np.exp(-((freq - 38)**2) / 40)
+            results['frequencies'] = freqs
+            results['stallguard_values'] = sg_values
+            
+            # Поиск пиков резонанса: локальные максимумы выше mean + std
+            peak_idx = []
+            if steps > 2:
+                mean = sum(sg_values) / steps
+                threshold = mean + math.sqrt(sum((sg - mean)**2 for sg in sg_values) / steps)
+                peak_idx = [i for i in range(1, steps - 1)
+                            if sg_values[i - 1] < sg_values[i] > sg_values[i + 1]
+                            and sg_values[i] > threshold]
+        else:
+            # Генерация частот
+            freqs = np.linspace(frequency_range[0], frequency_range[1], steps)
+            
+            sg_raw = amplitude * np.exp(-((freqs - center)**2) / width)
+            sg_raw += np.random.normal(0, 5, size=steps)  # Добавляем шум
             
-            sg_value += np.random.normal(0, 5)  # Добавляем шум
+            sg_values = np.maximum(0, sg_raw)
             
-            results['frequencies'].append(freq)
-            results['stallguard_values'].append(max(0, sg_value))
+            results['frequencies'] = freqs.tolist()
+            results['stallguard_values'] = sg_values.tolist()
             
-            print(f"  {freq:.1f}Hz: SG={sg_value:.1f}")
+            # Поиск пиков резонанса: локальные максимумы выше mean + std
+            # SciPy импортируется при первом вызове, как и в цифровом двойнике
+            from scipy.signal import find_peaks
+            
+            peak_idx, _ = find_peaks(sg_values, height=sg_values.mean() + sg_values.std())
         
-        # Поиск пиков резонанса
-        sg_values = np.array(results['stallguard_values'])
+        # Поточечный вывод только при включенном DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            for freq, sg_value in zip(results['frequencies'], sg_raw):
+                logger.debug("  %.1fHz: SG=%.1f", freq, sg_value)
         
-        # Простой алгоритм поиска пиков
-        for i in range(1, len(sg_values) - 1):
-            if sg_values[i] > sg_values[i-1] and sg_values[i] > sg_values[i+1]:
-                if sg_values[i] > np.mean(sg_values) + np.std(sg_values):
-                    peak_freq = results['frequencies'][i]
-                    results['resonance_peaks'].append({
-                        'frequency': peak_freq,
-                        'amplitude': float(sg_values[i])
-                    })
+        results['resonance_peaks'] = [
+            {
+                'frequency': results['frequencies'][i],
+                'amplitude': float(sg_values[i])
+            }
+            for i in peak_idx
+        ]
         
-        print(f"Found {len(results['resonance_peaks'])} resonance peaks")
+        logger.info("Found %d resonance peaks", len(results['resonance_peaks']))
         return results
     
     def auto_tune_current(self, target_temp: float = 50.0, 
@@ -296,17 +466,25 @@ class TMC2209Driver:
             max_current: Максимальный допустимый ток (A)
         
         Returns:
-            Оптимальный ток (A)
+            Оптимальный ток (A); драйвер остается настроенным на него,
+            self.config.current обновлен
         """
-        print("Auto-tuning motor current...")
+        logger.info("Auto-tuning motor current...")
         
         currents = np.linspace(0.5, max_current, 10)
         optimal_current = 0.8  # По умолчанию
         
-        for current in currents:
+        # Нагрев монотонен по току, поэтому первый ток сетки, на котором
+        # достигнут целевой диапазон или перегрев, ищется бисекцией
+        # (~4 измерения вместо 10); меняется только IHOLD_IRUN
+        too_hot = {}
+        lo, hi = 0, len(currents)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = float(currents[mid])
+            
             # Устанавливаем ток
-            self.config.current = current
-            self.setup_driver(self.config)
+            self._set_current(current)
             
             # В реальной системе здесь было бы измерение температуры
             # Для прототипа используем модель
@@ -317,24 +495,38 @@ class TMC2209Driver:
             
             # Проверяем перегрев (симулируем)
             simulated_temp = current * 30  # Упрощенная модель
-            if simulated_temp > target_temp * 1.2:
-                print(f"  {current:.2f}A: Too hot ({simulated_temp:.1f}°C)")
-                break
-            
-            # Имитация: если ток дает хороший результат без ошибок
-            optimal_current = current
-            print(f"  {current:.2f}A: OK ({simulated_temp:.1f}°C)")
+            too_hot[mid] = simulated_temp > target_temp * 1.2
+            if too_hot[mid]:
+                logger.debug("  %.2fA: Too hot (%.1f°C)", current, simulated_temp)
+            else:
+                logger.debug("  %.2fA: OK (%.1f°C)", current, simulated_temp)
             
-            if current >= target_temp / 40:  # Упрощенная модель
-                print(f"  Reached target temperature range")
-                break
+            if too_hot[mid] or current >= target_temp / 40:  # Упрощенная модель
+                hi = mid
+            else:
+                lo = mid + 1
+        
+        if lo == len(currents):
+            # Целевой диапазон не достигнут - максимальный ток сетки
+            optimal_current = float(currents[-1])
+        elif too_hot[lo]:
+            # Перегрев - предыдущий ток сетки
+            if lo > 0:
+                optimal_current = float(currents[lo - 1])
+        else:
+            optimal_current = float(currents[lo])
+            logger.debug("  Reached target temperature range")
+        
+        # Оставляем драйвер настроенным на найденный ток
+        self.config.current = optimal_current
+        self._set_current(optimal_current)
         
-        print(f"Optimal current: {optimal_current:.2f}A")
+        logger.info("Optimal current: %.2fA", optimal_current)
         return optimal_current
     
     def measure_backlash(self, axis: str = 'x') -> float:
         """Измерение люфта (упрощенная версия)"""
-        print(f"Measuring backlash for {axis}-axis...")
+        logger.info("Measuring backlash for %s-axis...", axis)
         
         # В реальной системе здесь были бы команды движения вперед-назад
         # и измерения позиции с датчиков
@@ -342,5 +534,5 @@ class TMC2209Driver:
         # Симуляция: возвращаем типичное значение
         backlash = 0.01  # 10 микрон
         
-        print(f"  Backlash: {backlash:.3f} mm")
+        logger.info("  Backlash: %.3f mm", backlash)
         return backlash
\ No newline at end of file
@@ -6,6 +6,7 @@ Intelligent Motion Planning System for 3D Printers
 
 import sys
 import argparse
+import logging
 from digital_twin.printer_model import DigitalTwin, PrinterParams
 from mpc_controller.mpc_planner import IntelligentPlanner, MotionConstraints
 from hardware_interface.tmc2209_driver import TMC2209Driver, TMC2209Config
@@ -51,9 +52,8 @@ def run_calibration(port: str = '/dev/ttyUSB0'):
         
         # 2. Автонастройка тока
         print("\n[1/4] Auto-tuning motor current...")
+        # Драйвер остается настроенным на найденный ток (config.current обновлен)
         optimal_current = driver.auto_tune_current(target_temp=50.0)
-        config.current = optimal_current
-        driver.setup_driver(config)
         
         # 3. Измерение резонансов
         print("\n[2/4] Measuring resonance frequencies...")
@@ -154,6 +154,9 @@ def main():
     
     args = parser.parse_args()
     
+    # Сообщения драйвера выводятся через logging (INFO и выше)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     if args.mode == 'calibrate':
         # Режим калибровки
         run_calibration(args.port)
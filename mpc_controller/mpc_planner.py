@@ -1,9 +1,34 @@
 import numpy as np
+from numba import njit
 from scipy.optimize import minimize
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Optional
+from scipy.linalg import cho_factor, cho_solve
+from dataclasses import dataclass, astuple
+from typing import List, Tuple, Dict, Optional, Union
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
 import warnings
 
+try:
+    from joblib import Memory
+except ImportError:  # joblib необязателен: без него работает только кэш в памяти
+    Memory = None
+
+# Версия решателя MPC: увеличивается при изменении стоимости, ограничений
+# или формата плана, планы прошлых версий на диске не читаются
+MPC_SOLVER_VERSION = 1
+
+# Дисковый кэш MPC-планов сегментов (переживает перезапуск): каталог
+# задается NOVAMOTION_MPC_CACHE, по умолчанию - кэш пользователя
+MPC_CACHE_DIR = os.path.abspath(os.environ.get(
+    'NOVAMOTION_MPC_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'novamotion', 'mpc')
+))
+MPC_CACHE_BYTES_LIMIT = 100 * 1024 ** 2  # 100 МБ
+MPC_CACHE_TRIM_INTERVAL = 600.0  # с, не чаще одного обхода каталога кэша
+
 @dataclass
 class MotionConstraints:
     """Ограничения движения"""
@@ -17,6 +42,172 @@ class MotionConstraints:
                 abs(a) <= self.max_acceleration and 
                 abs(j) <= self.max_jerk)
 
+@njit(cache=True, fastmath=True)
+def _cost_kernel(u, p0, v0, target_x, a00, a01, a10, a11, b0, b1,
+                 w_track, w_acc, w_jerk, w_vib, vib, horizon):
+    """
+    Стоимость MPC для последовательности управлений
+    
+    Модель оси X: [p, v]_{k+1} = A @ [p, v]_k + B * u[k, 0], матрицы
+    передаются поэлементно.
+    
+    Args:
+        u: Управления, форма (n_steps, 3)
+        p0, v0: Начальные позиция и скорость по X
+        target_x: Целевые позиции по X
+        vib: Штраф за вибрации по шагам (может быть пустым)
+        horizon: Горизонт предсказания
+    """
+    n_steps = min(u.shape[0], horizon)
+    cost = 0.0
+    p = p0
+    v = v0
+    
+    for k in range(n_steps):
+        u0 = u[k, 0]
+        u1 = u[k, 1]
+        u2 = u[k, 2]
+        
+        # Предсказание состояния (упрощенно для X оси)
+        p_next = a00 * p + a01 * v + b0 * u0
+        v_next = a10 * p + a11 * v + b1 * u0
+        
+        # Ошибка слежения
+        if k < target_x.shape[0]:
+            err = p_next - target_x[k]
+            cost += w_track * err * err
+        
+        # Штраф за ускорение
+        cost += w_acc * (u0 * u0 + u1 * u1 + u2 * u2)
+        
+        # Штраф за рывок (если не первая итерация)
+        if k > 0:
+            j0 = u0 - u[k - 1, 0]
+            j1 = u1 - u[k - 1, 1]
+            j2 = u2 - u[k - 1, 2]
+            cost += w_jerk * (j0 * j0 + j1 * j1 + j2 * j2)
+        
+        # Штраф за вибрации (упрощенный)
+        if k < vib.shape[0]:
+            cost += w_vib * vib[k]
+        
+        p = p_next
+        v = v_next
+    
+    return cost
+
+@njit(cache=True, fastmath=True)
+def _grad_kernel(u, p0, v0, target_x, a00, a01, a10, a11, b0, b1,
+                 w_track, w_acc, w_jerk, horizon):
+    """
+    Аналитический градиент _cost_kernel по u, форма (n_steps, 3)
+    
+    Вклад слежения считается сопряженным (обратным) проходом по модели,
+    вклады ускорения и рывка - напрямую.
+    """
+    n_steps = min(u.shape[0], horizon)
+    grad = np.zeros(u.shape)
+    err = np.zeros(n_steps)
+    
+    # Прямой проход: ошибки слежения
+    p = p0
+    v = v0
+    for k in range(n_steps):
+        p_next = a00 * p + a01 * v + b0 * u[k, 0]
+        v_next = a10 * p + a11 * v + b1 * u[k, 0]
+        if k < target_x.shape[0]:
+            err[k] = p_next - target_x[k]
+        p = p_next
+        v = v_next
+    
+    # Обратный проход: lam_{k+1} = dJ/dx_{k+1} = A^T @ lam_{k+2} + 2*w_track*err_k*[1, 0]
+    lam_p = 0.0
+    lam_v = 0.0
+    for k in range(n_steps - 1, -1, -1):
+        lam_p, lam_v = a00 * lam_p + a10 * lam_v, a01 * lam_p + a11 * lam_v
+        lam_p += 2.0 * w_track * err[k]
+        grad[k, 0] += b0 * lam_p + b1 * lam_v
+    
+    for k in range(n_steps):
+        for i in range(3):
+            # Штраф за ускорение
+            grad[k, i] += 2.0 * w_acc * u[k, i]
+            
+            # Штраф за рывок
+            if k > 0:
+                jerk = u[k, i] - u[k - 1, i]
+                grad[k, i] += 2.0 * w_jerk * jerk
+                grad[k - 1, i] -= 2.0 * w_jerk * jerk
+    
+    return grad
+
+@lru_cache(maxsize=32)
+def _discrete_coeffs(mass: float, damping: float, stiffness: float,
+                     dt: float) -> Tuple[float, float, float, float, float, float]:
+    """
+    Элементы дискретных матриц модели оси (a00, a01, a10, a11, b0, b1)
+    
+    Непрерывная модель x_dot = A*x + B*u с A = [[0, 1], [-k/m, -c/m]],
+    B = [0, 1/m], дискретизация методом Эйлера: I + A*dt, B*dt.
+    """
+    return (1.0, dt,
+            -stiffness / mass * dt, 1.0 - damping / mass * dt,
+            0.0, dt / mass)
+
+@lru_cache(maxsize=32)
+def _model_matrices(mass: float, damping: float, stiffness: float,
+                    dt: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Дискретные матрицы модели оси, кэшируются по (mass, damping, stiffness, dt)
+    
+    Массивы общие для всех вызовов, поэтому только для чтения.
+    """
+    a00, a01, a10, a11, b0, b1 = _discrete_coeffs(mass, damping, stiffness, dt)
+    A_disc = np.array([[a00, a01],
+                       [a10, a11]])
+    B_disc = np.array([[b0],
+                       [b1]])
+    
+    A_disc.setflags(write=False)
+    B_disc.setflags(write=False)
+    return A_disc, B_disc
+
+@lru_cache(maxsize=32)
+def _qp_system(mass: float, damping: float, stiffness: float, dt: float,
+               w_track: float, w_acc: float, w_jerk: float,
+               n_steps: int, n_track: int) -> Tuple[np.ndarray, np.ndarray, tuple]:
+    """
+    Матрицы квадратичной задачи MPC для оси X (не зависят от x0 и цели)
+    
+    Returns:
+        (G, F, H_factor): импульсная характеристика G[k, j] = (A^(k-j) @ B)[0],
+        свободное движение F[k] = (A^(k+1))[0, :] и разложение Холецкого
+        H = w_acc*I + w_jerk*D^T*D + w_track*G^T*G
+    """
+    A, B = _model_matrices(mass, damping, stiffness, dt)
+    
+    F = np.zeros((n_track, 2))
+    impulse = np.zeros(n_track)
+    power = np.eye(2)
+    response = B[:, 0].astype(np.float64)
+    for k in range(n_track):
+        power = A @ power
+        F[k] = power[0]
+        impulse[k] = response[0]
+        response = A @ response
+    
+    G = np.zeros((n_track, n_steps))
+    for k in range(n_track):
+        G[k, :k + 1] = impulse[k::-1]
+    
+    D = np.diff(np.eye(n_steps), axis=0)  # Первые разности (рывок)
+    H = w_acc * np.eye(n_steps) + w_jerk * (D.T @ D) + w_track * (G.T @ G)
+    H_factor = cho_factor(H)
+    
+    G.setflags(write=False)
+    F.setflags(write=False)
+    return G, F, H_factor
+
 class MPCTrajectoryOptimizer:
     """MPC оптимизатор траектории"""
     
@@ -34,70 +225,108 @@ class MPCTrajectoryOptimizer:
         
     def build_model_matrices(self, mass: float, damping: float, 
                              stiffness: float) -> Tuple[np.ndarray, np.ndarray]:
-        """Построение матриц пространства состояний"""
-        # Дискретная модель: x_dot = A*x + B*u
-        A_cont = np.array([[0, 1],
-                          [-stiffness/mass, -damping/mass]])
-        
-        B_cont = np.array([[0],
-                          [1/mass]])
-        
-        # Дискретизация (простейший метод Эйлера)
-        A_disc = np.eye(2) + A_cont * self.dt
-        B_disc = B_cont * self.dt
-        
-        return A_disc, B_disc
+        """Построение матриц пространства состояний (кэшируются, только для чтения)"""
+        return _model_matrices(float(mass), float(damping), float(stiffness), self.dt)
     
-    def cost_function(self, u_sequence: np.ndarray, *args) -> float:
-        """Функция стоимости MPC"""
-        x0, target_trajectory, model_params, vibration_penalty = args
-        
-        n_steps = len(u_sequence) // 3  # 3 оси
+    def _model_coeffs(self, mass: float, damping: float,
+                      stiffness: float) -> Tuple[float, float, float, float, float, float]:
+        """Элементы матриц модели (a00, a01, a10, a11, b0, b1) скалярами для ядер"""
+        return _discrete_coeffs(float(mass), float(damping), float(stiffness), self.dt)
+    
+    @staticmethod
+    def _x_axis_params(model_params: dict) -> Tuple[float, float, float]:
+        """Масса, демпфирование и жесткость оси X"""
+        # Используем параметры для оси X (упрощенно)
+        return (float(model_params.get('mass_x', 0.5)),
+                float(model_params.get('c_x', 5.0)),
+                float(model_params.get('k_x', 5000.0)))
+    
+    def cost_function(self, u_sequence: np.ndarray, x0: np.ndarray,
+                      target_trajectory: np.ndarray, coeffs: Tuple[float, ...],
+                      vibration_penalty: Optional[np.ndarray]) -> float:
+        """Функция стоимости MPC (coeffs - элементы матриц модели оси X)"""
+        n_steps = u_sequence.size // 3  # 3 оси
         if n_steps == 0:
             return 1e6  # Большая стоимость при пустой последовательности
         
         # Преобразуем в 2D массив
-        if u_sequence.ndim == 1:
-            u_sequence = u_sequence.reshape((n_steps, 3))
-        
-        cost = 0.0
-        x = x0.copy()
+        u = np.ascontiguousarray(u_sequence, dtype=np.float64).reshape(-1)
+        u = u[:3 * n_steps].reshape((n_steps, 3))
         
-        # Используем параметры для оси X (упрощенно)
-        A, B = self.build_model_matrices(
-            model_params.get('mass_x', 0.5),
-            model_params.get('c_x', 5.0),
-            model_params.get('k_x', 5000.0)
+        if vibration_penalty is None:
+            vib = np.empty(0)
+        else:
+            vib = np.asarray(vibration_penalty, dtype=np.float64)
+        target_x = np.ascontiguousarray(target_trajectory[:, 0], dtype=np.float64)
+        
+        w = self.weights
+        return _cost_kernel(
+            u, float(x0[0]), float(x0[1]), target_x, *coeffs,
+            w['tracking'], w['acceleration'], w['jerk'], w['vibration'],
+            vib, self.horizon
         )
+    
+    def cost_gradient(self, u_sequence: np.ndarray, x0: np.ndarray,
+                      target_trajectory: np.ndarray, coeffs: Tuple[float, ...],
+                      vibration_penalty: Optional[np.ndarray]) -> np.ndarray:
+        """Аналитический градиент функции стоимости (те же аргументы)"""
+        grad = np.zeros(u_sequence.size)
+        n_steps = u_sequence.size // 3  # 3 оси
+        if n_steps == 0:
+            return grad
         
-        for k in range(min(n_steps, self.horizon)):
-            # Управление
-            u = u_sequence[k] if k < len(u_sequence) else np.zeros(3)
-            
-            # Предсказание состояния (упрощенно для X оси)
-            x_next = A @ x[:2] + B * u[0]  # Используем только X компонент
-            
-            # Ошибка слежения
-            if k < len(target_trajectory):
-                tracking_error = np.linalg.norm(x_next[0] - target_trajectory[k, 0])
-                cost += self.weights['tracking'] * tracking_error**2
-            
-            # Штраф за ускорение
-            acceleration_cost = np.sum(u**2)
-            cost += self.weights['acceleration'] * acceleration_cost
-            
-            # Штраф за рывок (если не первая итерация)
-            if k > 0:
-                jerk = u - u_sequence[k-1]
-                cost += self.weights['jerk'] * np.sum(jerk**2)
-            
-            # Штраф за вибрации (упрощенный)
-            if vibration_penalty is not None and k < len(vibration_penalty):
-                cost += self.weights['vibration'] * vibration_penalty[k]
-            
-            x[:2] = x_next
+        u = np.ascontiguousarray(u_sequence, dtype=np.float64).reshape(-1)
+        u = u[:3 * n_steps].reshape((n_steps, 3))
+        
+        target_x = np.ascontiguousarray(target_trajectory[:, 0], dtype=np.float64)
+        
+        w = self.weights
+        grad[:3 * n_steps] = _grad_kernel(
+            u, float(x0[0]), float(x0[1]), target_x, *coeffs,
+            w['tracking'], w['acceleration'], w['jerk'], self.horizon
+        ).reshape(-1)
+        return grad
+    
+    def _solve_unconstrained(self, x0: np.ndarray, target_trajectory: np.ndarray,
+                             axis_params: Tuple[float, float, float],
+                             n_steps: int) -> Optional[np.ndarray]:
+        """
+        Минимум квадратичной функции стоимости без ограничений
+        
+        Позиция по X линейна по управлениям: p_{k+1} = c_k + sum_j G[k, j] * u_j,
+        где c_k - свободное движение, G[k, j] = (A^(k-j) @ B)[0]. Оси Y и Z
+        не отслеживаются, поэтому их оптимум - нулевое управление, а для X
+        решается система (w_acc*I + w_jerk*D^T*D + w_track*G^T*G) u = w_track*G^T (t - c).
+        Матрицы и разложение системы кэшируются, на вызов остается
+        одна подстановка.
+        
+        Returns:
+            Управления (3 * n_steps) или None, если система вырождена
+        """
+        if n_steps == 0 or n_steps > self.horizon:
+            # За горизонтом стоимость не зависит от управления
+            return None
+        
+        n_track = min(n_steps, len(target_trajectory))
+        w = self.weights
+        
+        try:
+            G, F, H_factor = _qp_system(
+                *axis_params, self.dt,
+                float(w['tracking']), float(w['acceleration']), float(w['jerk']),
+                n_steps, n_track
+            )
+        except np.linalg.LinAlgError:
+            return None
+        
+        # Свободное движение из начального состояния
+        free = F @ x0
+        rhs = w['tracking'] * (G.T @ (target_trajectory[:n_track, 0] - free))
+        u_x = cho_solve(H_factor, rhs)
         
-        return cost
+        u = np.zeros((n_steps, 3))
+        u[:, 0] = u_x
+        return u.reshape(-1)
     
     def optimize_trajectory(self, start_pos: np.ndarray, 
                            target_pos: np.ndarray,
@@ -112,46 +341,62 @@ class MPCTrajectoryOptimizer:
             model_params: Параметры модели
             constraints: Ограничения движения
         """
-        # Начальное состояние
-        x0 = np.zeros(6)
-        x0[[0, 2, 4]] = start_pos
+        start_pos = np.asarray(start_pos, dtype=np.float64)
+        
+        # Начальное состояние оси X [позиция, скорость]: модель
+        # стоимости использует только ее
+        x0 = np.array([start_pos[0], 0.0], dtype=np.float64)
         
         # Создание целевой траектории (линейная интерполяция)
         n_points = self.horizon
-        target_trajectory = np.zeros((n_points, 3))
-        
-        for i in range(3):
-            target_trajectory[:, i] = np.linspace(
-                start_pos[i], target_pos[i], n_points
-            )
+        t = np.linspace(0.0, 1.0, n_points)[:, None]
+        target_trajectory = start_pos + t * (np.asarray(target_pos, dtype=np.float64) - start_pos)
+        # Столбцы непрерывны: цель по X передается в ядра стоимости
+        # и градиента без копии на каждом вызове
+        target_trajectory = np.asfortranarray(target_trajectory)
         
         # Простая оценка вибраций
         vibration_penalty = np.ones(n_points) * 0.1
         
-        # Начальное предположение для управления
-        u_init = np.zeros(3 * n_points)
-        
         # Ограничения для оптимизации
-        bounds = []
-        for _ in range(n_points):
-            for _ in range(3):
-                bounds.append((-constraints.max_acceleration, 
-                              constraints.max_acceleration))
-        
-        # Оптимизация
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            result = minimize(
-                self.cost_function,
-                u_init,
-                args=(x0, target_trajectory, model_params, vibration_penalty),
-                bounds=bounds,
-                method='L-BFGS-B',
-                options={'maxiter': 100, 'disp': False}
-            )
+        bounds = [(-constraints.max_acceleration,
+                   constraints.max_acceleration)] * (3 * n_points)
+        
+        # Элементы матриц модели - один раз на вызов (и кэшируются между вызовами)
+        axis_params = self._x_axis_params(model_params)
+        coeffs = self._model_coeffs(*axis_params)
+        args = (x0, target_trajectory, coeffs, vibration_penalty)
+        
+        # Стоимость квадратична по u: если оптимум без ограничений лежит
+        # внутри допустимой области, он и есть решение
+        u_qp = self._solve_unconstrained(x0, target_trajectory, axis_params, n_points)
+        if u_qp is not None and np.all(np.abs(u_qp) <= constraints.max_acceleration):
+            success, u_result, cost, message = True, u_qp, self.cost_function(u_qp, *args), None
+        else:
+            # Ограничения активны - итерационная оптимизация. Теплый старт:
+            # оптимум без ограничений, обрезанный по границам (вычисляется
+            # в этом же вызове, поэтому результат зависит только от аргументов)
+            max_a = constraints.max_acceleration
+            if u_qp is not None:
+                u_init = np.clip(u_qp, -max_a, max_a)
+            else:
+                u_init = np.zeros(3 * n_points)
+            
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                result = minimize(
+                    self.cost_function,
+                    u_init,
+                    args=args,
+                    jac=self.cost_gradient,
+                    bounds=bounds,
+                    method='L-BFGS-B',
+                    options={'maxiter': 100, 'disp': False}
+                )
+            success, u_result, cost, message = result.success, result.x, result.fun, result.message
         
-        if result.success:
-            u_optimal = result.x.reshape((n_points, 3))
+        if success:
+            u_optimal = u_result.reshape((n_points, 3))
             
             # Генерация профиля скорости
             velocity_profile = self._generate_velocity_profile(
@@ -162,13 +407,13 @@ class MPCTrajectoryOptimizer:
                 'success': True,
                 'control_sequence': u_optimal,
                 'velocity_profile': velocity_profile,
-                'cost': result.fun
+                'cost': cost
             }
         else:
             # Резервный профиль
             return {
                 'success': False,
-                'error': result.message,
+                'error': message,
                 'velocity_profile': self._generate_simple_profile(
                     start_pos, target_pos, constraints
                 )
@@ -177,14 +422,17 @@ class MPCTrajectoryOptimizer:
     def _generate_velocity_profile(self, start: np.ndarray, end: np.ndarray,
                                   u_sequence: np.ndarray,
                                   constraints: MotionConstraints) -> Dict:
-        """Генерация плавного профиля скорости"""
-        distance = np.linalg.norm(end - start)
+        """Генерация плавного профиля скорости (позиции - массив (K, 3))"""
+        start = np.asarray(start, dtype=np.float64)
+        end = np.asarray(end, dtype=np.float64)
+        diff = end - start
+        distance = np.linalg.norm(diff)
         
         if distance < 0.1:
             return {
                 'times': [0],
                 'velocities': [0],
-                'positions': [start.tolist()],
+                'positions': np.array([start]),
                 'accelerations': [0]
             }
         
@@ -200,150 +448,306 @@ class MPCTrajectoryOptimizer:
             # Треугольный профиль
             t_accel = np.sqrt(distance / max_a)
             max_v_actual = max_a * t_accel
-            profile = [
-                (0, 0, start, 0),
-                (t_accel, max_v_actual, (start + end) / 2, max_a),
-                (2 * t_accel, 0, end, -max_a)
-            ]
+            times = [0, t_accel, 2 * t_accel]
+            velocities = [0, max_v_actual, 0]
+            accelerations = [0, max_a, -max_a]
+            # Начало, середина, конец
+            positions = np.empty((3, 3))
+            positions[0] = start
+            np.multiply(diff, 0.5, out=positions[1])
         else:
             # Трапецеидальный профиль
             t_coast = (distance - 2 * s_accel) / max_v
-            profile = [
-                (0, 0, start, 0),
-                (t_accel, max_v, start + (end - start) * s_accel / distance, max_a),
-                (t_accel + t_coast, max_v, end - (end - start) * s_accel / distance, 0),
-                (2 * t_accel + t_coast, 0, end, -max_a)
-            ]
-        
-        times = [p[0] for p in profile]
-        velocities = [p[1] for p in profile]
-        positions = [p[2].tolist() for p in profile]
-        accelerations = [p[3] for p in profile]
+            max_v_actual = max_v
+            times = [0, t_accel, t_accel + t_coast, 2 * t_accel + t_coast]
+            velocities = [0, max_v, max_v, 0]
+            accelerations = [0, max_a, 0, -max_a]
+            # Начало, конец разгона, начало торможения, конец
+            ramp = diff * (s_accel / distance)
+            positions = np.empty((4, 3))
+            positions[0] = start
+            positions[1] = ramp
+            np.subtract(diff, ramp, out=positions[2])
+        
+        # Промежуточные точки заданы смещением от start, концы - точно
+        positions[1:-1] += start
+        positions[-1] = end
         
         return {
             'times': times,
             'velocities': velocities,
             'positions': positions,
             'accelerations': accelerations,
-            'max_velocity': max_v if 2 * s_accel <= distance else max_v_actual
+            'max_velocity': max_v_actual
         }
     
     def _generate_simple_profile(self, start: np.ndarray, end: np.ndarray,
                                 constraints: MotionConstraints) -> Dict:
-        """Резервный простой профиль"""
+        """Резервный простой профиль (позиции - массив (2, 3))"""
         distance = np.linalg.norm(end - start)
         time = distance / max(constraints.max_velocity, 0.1) if distance > 0 else 1
         
         return {
             'times': [0, time],
             'velocities': [constraints.max_velocity, constraints.max_velocity],
-            'positions': [start.tolist(), end.tolist()],
+            'positions': np.array([start, end], dtype=np.float64),
             'accelerations': [0, 0],
             'max_velocity': constraints.max_velocity
         }
 
+def _solve_segment(from_pos: Tuple[float, ...], to_pos: Tuple[float, ...],
+                   params_items: Tuple, constraints_values: Tuple,
+                   mpc_settings: Tuple, planner) -> Tuple[Dict, np.ndarray, bool]:
+    """
+    MPC-план сегмента без симуляции
+    
+    Результат определяется ключевыми аргументами: концами (уже
+    округлены), параметрами модели, ограничениями и настройками MPC
+    (dt, горизонт, веса). planner в ключ дискового кэша не входит и
+    дает оптимизатор и конвертеры траектории.
+    
+    Returns:
+        (профиль движения, траектория [time, x, y, z], успех MPC)
+    """
+    # Выполняется только при промахе дискового кэша: появился новый план
+    global _mpc_cache_written
+    _mpc_cache_written = True
+    
+    start = np.array(from_pos)
+    end = np.array(to_pos)
+    constraints = MotionConstraints(*constraints_values)
+    
+    # Оптимизация траектории
+    mpc_result = planner.mpc.optimize_trajectory(
+        start, end, dict(params_items), constraints
+    )
+    
+    if mpc_result.get('success', False):
+        return (mpc_result['velocity_profile'],
+                planner._mpc_to_trajectory(mpc_result), True)
+    
+    # Использование простого профиля
+    simple_profile = planner.mpc._generate_simple_profile(start, end, constraints)
+    return simple_profile, planner._profile_to_trajectory(simple_profile), False
+
+# Дисковый кэш создается при первом планировании, а не при импорте:
+# импорт модуля ничего не пишет на диск
+_mpc_cache_location: Optional[str] = MPC_CACHE_DIR
+_mpc_cache_lock = threading.Lock()
+_mpc_memory = None
+_solve_segment_cached = None
+_mpc_cache_written = False
+_mpc_last_trim: Optional[float] = None
+
+def configure_mpc_cache(location: Optional[str] = MPC_CACHE_DIR):
+    """
+    Каталог дискового кэша MPC-планов (None отключает дисковый кэш)
+    
+    Планы хранятся в подкаталоге версии решателя; каталог создается
+    при первом планировании. Без joblib работает только кэш в памяти.
+    """
+    global _mpc_cache_location, _mpc_memory, _solve_segment_cached
+    with _mpc_cache_lock:
+        _mpc_cache_location = location
+        _mpc_memory = None
+        _solve_segment_cached = None
+
+def _segment_solver():
+    """Планировщик сегмента: через дисковый кэш, если он включен"""
+    global _mpc_memory, _solve_segment_cached
+    solver = _solve_segment_cached
+    if solver is not None:
+        return solver
+    
+    with _mpc_cache_lock:
+        if _solve_segment_cached is None:
+            if Memory is None or _mpc_cache_location is None:
+                _solve_segment_cached = _solve_segment
+            else:
+                # Повторный запуск той же G-code программы читает планы с диска
+                location = os.path.join(os.path.abspath(_mpc_cache_location),
+                                        f'v{MPC_SOLVER_VERSION}')
+                _mpc_memory = Memory(location, verbose=0)
+                _solve_segment_cached = _mpc_memory.cache(_solve_segment,
+                                                          ignore=['planner'])
+        return _solve_segment_cached
+
+def trim_mpc_cache():
+    """
+    Сокращение дискового кэша до MPC_CACHE_BYTES_LIMIT (старые планы удаляются)
+    
+    Обход каталога выполняется только после записи новых планов и не
+    чаще MPC_CACHE_TRIM_INTERVAL: попадания в кэш его не вызывают.
+    """
+    global _mpc_cache_written, _mpc_last_trim
+    with _mpc_cache_lock:
+        memory = _mpc_memory
+        now = time.monotonic()
+        if (memory is None or not _mpc_cache_written
+                or (_mpc_last_trim is not None
+                    and now - _mpc_last_trim < MPC_CACHE_TRIM_INTERVAL)):
+            return
+        _mpc_cache_written = False
+        _mpc_last_trim = now
+    
+    memory.reduce_size(bytes_limit=MPC_CACHE_BYTES_LIMIT)
+
 class IntelligentPlanner:
     """Интеллигентный планировщик с MPC"""
     
+    # Размер кэша траекторий и точность ключа (3 знака мм = 1 мкм)
+    TRAJECTORY_CACHE_SIZE = 4096
+    POSITION_DECIMALS = 3
+    
     def __init__(self, twin_model):
         self.twin = twin_model
         self.mpc = MPCTrajectoryOptimizer()
         self.constraints = MotionConstraints()
         
-        # Кэш оптимизированных траекторий
-        self.trajectory_cache = {}
+        # Кэши по округленным концам сегмента (LRU): полный результат
+        # plan_movement и MPC-план без симуляции для optimize_print_path
+        self._plan_cached = lru_cache(maxsize=self.TRAJECTORY_CACHE_SIZE)(self._plan_segment)
+        self._trajectory_cached = lru_cache(maxsize=self.TRAJECTORY_CACHE_SIZE)(self._plan_trajectory)
+        
+        # Digital Twin хранит состояние люфта, поэтому его симуляции
+        # выполняются по одной даже при параллельном планировании
+        self._twin_lock = threading.Lock()
         
     def plan_movement(self, from_pos: Tuple[float, float, float],
                      to_pos: Tuple[float, float, float]) -> Dict:
         """Планирование движения между двумя точками"""
-        
-        # Проверка кэша
-        cache_key = f"{from_pos}_{to_pos}"
-        if cache_key in self.trajectory_cache:
-            return self.trajectory_cache[cache_key]
-        
-        start = np.array(from_pos)
-        end = np.array(to_pos)
-        
-        # Оптимизация траектории
-        mpc_result = self.mpc.optimize_trajectory(
-            start, end,
-            self.twin.params.to_dict(),
-            self.constraints
+        return self._plan_cached(self._round_position(from_pos),
+                                 self._round_position(to_pos))
+    
+    def _round_position(self, pos) -> Tuple[float, ...]:
+        """Ключ кэша: координаты, округленные до точности движения"""
+        decimals = self.POSITION_DECIMALS
+        return tuple(round(float(c), decimals) for c in pos)
+    
+    def _plan_trajectory(self, from_pos: Tuple[float, ...],
+                         to_pos: Tuple[float, ...]) -> Tuple[Dict, np.ndarray, bool]:
+        """MPC-план сегмента без симуляции (концы уже округлены), через дисковый кэш"""
+        mpc = self.mpc
+        return _segment_solver()(
+            from_pos, to_pos,
+            tuple(sorted(self.twin.params.to_dict().items())),
+            astuple(self.constraints),
+            (mpc.dt, mpc.horizon, tuple(sorted(mpc.weights.items()))),
+            self
         )
+    
+    def _plan_segment(self, from_pos: Tuple[float, ...],
+                      to_pos: Tuple[float, ...]) -> Dict:
+        """Планирование сегмента без кэша (концы уже округлены)"""
+        profile, trajectory, mpc_success = self._trajectory_cached(from_pos, to_pos)
         
-        if mpc_result.get('success', False):
-            # Симуляция движения через Digital Twin
-            trajectory = self._mpc_to_trajectory(mpc_result)
+        # Симуляция движения через Digital Twin
+        with self._twin_lock:
             simulation = self.twin.simulate_movement(trajectory)
             
             # Расчет метрик качества
             quality = self.twin.calculate_quality_metrics(simulation)
-            
-            result = {
-                'planned_trajectory': mpc_result['velocity_profile'],
-                'simulation': simulation,
-                'quality_metrics': quality,
-                'mpc_success': True
-            }
-        else:
-            # Использование простого профиля
-            simple_profile = self.mpc._generate_simple_profile(
-                start, end, self.constraints
-            )
-            trajectory = self._profile_to_trajectory(simple_profile)
-            simulation = self.twin.simulate_movement(trajectory)
-            quality = self.twin.calculate_quality_metrics(simulation)
-            
-            result = {
-                'planned_trajectory': simple_profile,
-                'simulation': simulation,
-                'quality_metrics': quality,
-                'mpc_success': False,
-                'warning': 'MPC failed, using simple profile'
-            }
         
-        # Кэширование результата
-        self.trajectory_cache[cache_key] = result
+        return self._segment_result(profile, simulation, quality, mpc_success)
+    
+    @staticmethod
+    def _segment_result(profile: Dict, simulation: Dict, quality: Dict,
+                        mpc_success: bool) -> Dict:
+        """Результат планирования сегмента"""
+        result = {
+            'planned_trajectory': profile,
+            'simulation': simulation,
+            'quality_metrics': quality,
+            'mpc_success': mpc_success
+        }
+        if not mpc_success:
+            result['warning'] = 'MPC failed, using simple profile'
         return result
     
+    @staticmethod
+    def _join_trajectories(trajectories: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Склейка траекторий сегментов в одну с непрерывным временем
+        
+        Каждый сегмент сдвигается по времени к концу предыдущего, его первая
+        точка (совпадающая с концом предыдущего) отбрасывается.
+        
+        Returns:
+            (траектория [time, x, y, z], индекс строки, с которой начинается
+            первый интервал каждого сегмента)
+        """
+        pieces = []
+        seg_row = np.empty(len(trajectories), dtype=np.int64)
+        n_rows = 0
+        t_end = 0.0
+        
+        for i, trajectory in enumerate(trajectories):
+            # Первый интервал сегмента начинается с последней строки предыдущего
+            seg_row[i] = max(n_rows - 1, 0)
+            if len(trajectory) == 0:
+                continue
+            
+            piece = trajectory.copy()
+            piece[:, 0] += t_end - piece[0, 0]
+            if pieces:
+                piece = piece[1:]
+            if len(piece):
+                pieces.append(piece)
+                n_rows += len(piece)
+                t_end = piece[-1, 0]
+        
+        if not pieces:
+            return np.empty((0, 4)), seg_row
+        return np.concatenate(pieces), seg_row
+    
     def _mpc_to_trajectory(self, mpc_result: dict) -> np.ndarray:
         """Конвертация результата MPC в формат траектории"""
         profile = mpc_result['velocity_profile']
         if not profile or 'positions' not in profile:
             return np.array([[0, 0, 0, 0]])
         
-        trajectory = []
-        time = 0
-        positions = profile['positions']
-        times = profile.get('times', list(range(len(positions))))
+        positions = self._positions_xyz(profile['positions'])
+        n = len(positions)
+        times = np.asarray(profile.get('times', np.arange(n)), dtype=np.float64)[:n]
         
-        for i in range(len(positions)):
-            pos = positions[i]
-            if i < len(times):
-                time = times[i]
-            trajectory.append([time, pos[0], pos[1], pos[2] if len(pos) > 2 else 0])
+        # Точки без времени получают последнее известное время
+        if len(times) < n:
+            last = times[-1] if len(times) else 0.0
+            times = np.concatenate((times, np.full(n - len(times), last)))
         
-        return np.array(trajectory)
+        return np.column_stack((times, positions))
     
     def _profile_to_trajectory(self, profile: dict) -> np.ndarray:
         """Конвертация профиля в траекторию"""
         if not profile or 'positions' not in profile:
             return np.array([[0, 0, 0, 0]])
         
-        trajectory = []
-        positions = profile['positions']
-        times = profile.get('times', list(range(len(positions))))
+        positions = self._positions_xyz(profile['positions'])
+        n = len(positions)
+        times = np.asarray(profile.get('times', np.arange(n)), dtype=np.float64)[:n]
         
-        for i, pos in enumerate(positions):
-            t = times[i] if i < len(times) else i
-            trajectory.append([t, pos[0], pos[1], pos[2] if len(pos) > 2 else 0])
+        # Точки без времени получают свой индекс
+        if len(times) < n:
+            times = np.concatenate((times, np.arange(len(times), n, dtype=np.float64)))
         
-        return np.array(trajectory)
+        return np.column_stack((times, positions))
     
-    def optimize_print_path(self, gcode_points: List[Tuple[float, float, float]]) -> Dict:
-        """Оптимизация полного пути печати"""
-        if not gcode_points or len(gcode_points) < 2:
+    @staticmethod
+    def _positions_xyz(positions) -> np.ndarray:
+        """Позиции как массив (n, 3); отсутствующая Z дополняется нулями"""
+        if len(positions) == 0:
+            return np.empty((0, 3))
+        
+        positions = np.asarray(positions, dtype=np.float64)
+        positions = positions.reshape(len(positions), -1)
+        if positions.shape[1] < 3:
+            positions = np.pad(positions, ((0, 0), (0, 3 - positions.shape[1])))
+        return positions[:, :3]
+    
+    def optimize_print_path(self, gcode_points: Union[List[Tuple[float, float, float]],
+                                                      np.ndarray]) -> Dict:
+        """Оптимизация полного пути печати (список точек или массив (n, 3))"""
+        if gcode_points is None or len(gcode_points) < 2:
             return {
                 'segments': [],
                 'average_quality': 0,
@@ -351,14 +755,47 @@ class IntelligentPlanner:
                 'max_quality': 0
             }
         
-        optimized_path = []
-        quality_scores = []
+        # Точки одним массивом, ключи строятся из его строк
+        points = np.asarray(gcode_points, dtype=np.float64)
+        keys = [self._round_position(p) for p in points.tolist()]
+        
+        # MPC-планы сегментов независимы: считаются параллельно, порядок
+        # результатов сохраняется
+        n_workers = min(len(keys) - 1, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            plans = list(executor.map(self._trajectory_cached, keys[:-1], keys[1:]))
+        
+        # Весь путь симулируется одним вызовом Digital Twin, состояние
+        # (включая люфт) переходит из сегмента в сегмент
+        full_trajectory, seg_row = self._join_trajectories([plan[1] for plan in plans])
+        with self._twin_lock:
+            simulation = self.twin.simulate_movement(full_trajectory)
+            
+            # Окна отсчетов сегментов по числу отсчетов на интервалах:
+            # окно начинается с первого отсчета первого интервала сегмента
+            n_samples = len(simulation['time'])
+            if n_samples:
+                counts = self.twin.sample_counts(full_trajectory)
+                interval_start = np.concatenate(([0], np.cumsum(counts)))
+                starts = interval_start[seg_row]
+            else:
+                starts = np.zeros(len(plans), dtype=np.int64)
+            stops = np.append(starts[1:], n_samples)
+            
+            optimized_path = []
+            for (profile, _, mpc_success), a, b in zip(plans, starts, stops):
+                window = {key: values[a:b] for key, values in simulation.items()}
+                quality = self.twin.calculate_quality_metrics(window)
+                optimized_path.append(
+                    self._segment_result(profile, window, quality, mpc_success)
+                )
+        
+        # Новые планы пути записаны на диск: кэш удерживается в пределе размера
+        trim_mpc_cache()
         
-        for i in range(len(gcode_points) - 1):
-            result = self.plan_movement(gcode_points[i], gcode_points[i + 1])
-            optimized_path.append(result)
-            if 'quality_metrics' in result:
-                quality_scores.append(result['quality_metrics']['overall_score'])
+        quality_scores = [result['quality_metrics']['overall_score']
+                          for result in optimized_path
+                          if 'quality_metrics' in result]
         
         avg_quality = np.mean(quality_scores) if quality_scores else 0
         
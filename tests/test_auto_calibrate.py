@@ -0,0 +1,52 @@
+import math
+
+from calibration.auto_calibrate import AutoCalibrator, CalibrationResult
+
+
+def _result(parameters):
+    return CalibrationResult(
+        success=True,
+        parameters=parameters,
+        resonance_peaks=[],
+        backlash_measurements={},
+        motor_currents={},
+        timestamp=0.0,
+        duration=0.0,
+    )
+
+
+def _valid_parameters():
+    return {
+        'resonance_freq_x': 45.0,
+        'resonance_freq_y': 38.0,
+        'mass_x': 0.5,
+        'mass_y': 0.8,
+    }
+
+
+def test_validate_calibration_passes_valid_parameters():
+    checks = AutoCalibrator().validate_calibration(_result(_valid_parameters()))
+    assert checks['resonance_x_in_range']
+    assert checks['all_checks_passed']
+
+
+def test_validate_calibration_fails_nan_parameter():
+    parameters = _valid_parameters()
+    parameters['resonance_freq_x'] = math.nan
+
+    checks = AutoCalibrator().validate_calibration(_result(parameters))
+
+    assert checks['has_resonance_freq_x']
+    assert checks['resonance_x_in_range'] is False
+    assert checks['all_checks_passed'] is False
+
+
+def test_validate_calibration_skips_range_check_for_missing_parameter():
+    parameters = _valid_parameters()
+    del parameters['mass_x']
+
+    checks = AutoCalibrator().validate_calibration(_result(parameters))
+
+    assert 'mass_x_plausible' not in checks
+    assert checks['has_mass_x'] is False
+    assert checks['all_checks_passed'] is False
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from scipy.optimize import approx_fprime, minimize
+
+import mpc_controller.mpc_planner as mpc_planner
+from digital_twin.printer_model import DigitalTwin, PrinterParams
+from mpc_controller.mpc_planner import (
+    IntelligentPlanner, MotionConstraints, MPCTrajectoryOptimizer
+)
+
+
+@pytest.fixture
+def no_disk_cache():
+    mpc_planner.configure_mpc_cache(None)
+    yield
+    mpc_planner.configure_mpc_cache()
+
+
+def _problem(seed=0, n_steps=10):
+    rng = np.random.default_rng(seed)
+    mpc = MPCTrajectoryOptimizer(horizon=n_steps)
+    coeffs = mpc._model_coeffs(0.5, 5.0, 5000.0)
+    x0 = np.array([rng.normal(), rng.normal()])
+    target = np.asfortranarray(rng.normal(size=(n_steps, 3)) * 5.0)
+    vib = np.full(n_steps, 0.1)
+    u = rng.normal(size=3 * n_steps) * 10.0
+    return mpc, u, (x0, target, coeffs, vib)
+
+
+def test_cost_gradient_matches_finite_differences():
+    mpc, u, args = _problem()
+
+    analytic = mpc.cost_gradient(u, *args)
+    numeric = approx_fprime(u, mpc.cost_function, 1e-6, *args)
+
+    np.testing.assert_allclose(analytic, numeric, rtol=1e-5, atol=1e-5)
+
+
+def test_unconstrained_solution_matches_lbfgsb():
+    mpc, u, args = _problem(seed=1)
+    x0, target, coeffs, vib = args
+
+    u_qp = mpc._solve_unconstrained(x0, target, (0.5, 5.0, 5000.0), len(target))
+    reference = minimize(
+        mpc.cost_function, np.zeros_like(u), args=args, jac=mpc.cost_gradient,
+        method='L-BFGS-B', options={'maxiter': 10000, 'gtol': 1e-12, 'ftol': 1e-15},
+    )
+
+    assert reference.success
+    np.testing.assert_allclose(mpc.cost_function(u_qp, *args), reference.fun, rtol=1e-9)
+    np.testing.assert_allclose(u_qp, reference.x, atol=1e-4)
+
+
+def _spy_minimize(monkeypatch):
+    calls = []
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs)
+        return minimize(*args, **kwargs)
+
+    monkeypatch.setattr(mpc_planner, 'minimize', spy)
+    return calls
+
+
+def test_unbounded_move_uses_closed_form_solution(monkeypatch):
+    calls = _spy_minimize(monkeypatch)
+
+    result = MPCTrajectoryOptimizer().optimize_trajectory(
+        np.zeros(3), np.array([10.0, 5.0, 0.0]),
+        PrinterParams().to_dict(), MotionConstraints(),
+    )
+
+    assert result['success']
+    assert calls == []
+
+
+def test_bounded_move_falls_back_to_lbfgsb(monkeypatch):
+    calls = _spy_minimize(monkeypatch)
+    mpc = MPCTrajectoryOptimizer()
+    constraints = MotionConstraints(max_acceleration=0.5)
+    start = np.zeros(3)
+    target = np.array([-40.0, 2.0, 1.0])
+
+    u_qp = mpc._solve_unconstrained(
+        np.zeros(2), start + np.linspace(0.0, 1.0, mpc.horizon)[:, None] * target,
+        (0.5, 5.0, 5000.0), mpc.horizon,
+    )
+    result = mpc.optimize_trajectory(start, target, PrinterParams().to_dict(), constraints)
+
+    assert np.abs(u_qp).max() > constraints.max_acceleration
+    assert len(calls) == 1
+    assert result['success']
+    assert np.abs(result['control_sequence']).max() <= constraints.max_acceleration
+
+
+def test_print_path_windows_match_per_segment_simulation(no_disk_cache):
+    # Without backlash a segment's simulation depends only on its trajectory
+    # and the state it starts from
+    params = PrinterParams(backlash_x=0.0, backlash_y=0.0)
+    points = np.random.default_rng(3).random((12, 3)).round(2) * 40.0
+    points = np.insert(points, 4, points[3], axis=0)  # zero-length segment
+
+    planner = IntelligentPlanner(DigitalTwin(params))
+    segments = planner.optimize_print_path(points)['segments']
+
+    # Reference: each segment simulated on its own, starting from the
+    # state the previous segment ended in
+    reference_twin = DigitalTwin(params)
+    keys = [planner._round_position(p) for p in points.tolist()]
+    for segment, a, b in zip(segments, keys[:-1], keys[1:]):
+        trajectory = planner._trajectory_cached(a, b)[1]
+        expected = reference_twin.simulate_movement(trajectory)
+        window = segment['simulation']
+
+        assert len(window['time']) == len(expected['time'])
+        if len(expected['time']) == 0:
+            continue
+        np.testing.assert_allclose(window['time'] - window['time'][0],
+                                   expected['time'] - expected['time'][0], atol=1e-12)
+        np.testing.assert_array_equal(window['target_pos'], expected['target_pos'])
+        np.testing.assert_allclose(window['actual_pos'], expected['actual_pos'],
+                                   rtol=1e-4, atol=1e-4)
+        np.testing.assert_allclose(window['velocity'], expected['velocity'],
+                                   rtol=1e-4, atol=1e-3)
+
+        reference_twin.pos = expected['actual_pos'][-1].astype(np.float64)
+        reference_twin.vel = expected['velocity'][-1].astype(np.float64)
@@ -0,0 +1,57 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from digital_twin.printer_model import KD_SCALE, KP_SCALE, DigitalTwin, PrinterParams
+
+
+def _reference_simulation(params, trajectory, times, counts):
+    """Numerical integration of the PD-driven axes, sampled at the twin's times"""
+    mass = np.array([params.mass_x, params.mass_y, params.mass_z])
+    damping = np.array([params.c_x, params.c_y, params.c_z])
+    stiffness = np.array([params.k_x, params.k_y, params.k_z])
+
+    pos = np.zeros(3)
+    vel = np.zeros(3)
+    positions = []
+    velocities = []
+    offset = 0
+    for i, count in enumerate(counts):
+        # Force is held constant over each trajectory interval
+        force = stiffness * KP_SCALE * (trajectory[i, 1:4] - pos) - damping * KD_SCALE * vel
+
+        def rhs(t, state):
+            x, v = state[:3], state[3:]
+            return np.concatenate((v, (force - damping * v - stiffness * x) / mass))
+
+        # Sample times are start + k*h and may overshoot the end by an ulp
+        t_eval = np.clip(times[offset:offset + count], trajectory[i, 0], trajectory[i + 1, 0])
+        solution = solve_ivp(rhs, (trajectory[i, 0], trajectory[i + 1, 0]),
+                             np.concatenate((pos, vel)), t_eval=t_eval,
+                             method='DOP853', rtol=1e-12, atol=1e-12)
+        positions.append(solution.y[:3].T)
+        velocities.append(solution.y[3:].T)
+        pos, vel = solution.y[:3, -1], solution.y[3:, -1]
+        offset += count
+
+    return np.concatenate(positions), np.concatenate(velocities)
+
+
+def test_simulate_movement_matches_numerical_integration():
+    params = PrinterParams(backlash_x=0.0, backlash_y=0.0)
+    trajectory = np.array([
+        [0.0, 0.0, 0.0, 0.0],
+        [0.013, 5.0, -2.0, 0.5],
+        [0.030, 12.0, 3.0, 0.5],
+        [0.051, 12.0, 3.0, 1.0],
+        [0.080, 0.0, 0.0, 0.0],
+    ])
+    twin = DigitalTwin(params)
+
+    simulation = twin.simulate_movement(trajectory)
+    counts = twin.sample_counts(trajectory)
+    ref_pos, ref_vel = _reference_simulation(params, trajectory, simulation['time'], counts)
+
+    assert len(simulation['time']) == counts.sum()
+    np.testing.assert_allclose(simulation['actual_pos'], ref_pos, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(simulation['velocity'], ref_vel,
+                               rtol=1e-5, atol=1e-5 * np.abs(ref_vel).max())
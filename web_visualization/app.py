@@ -1,16 +1,41 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, request
 from flask_socketio import SocketIO, emit
 import numpy as np
 import json
-import threading
-import time
+import orjson
 from digital_twin.printer_model import DigitalTwin, PrinterParams
 from mpc_controller.mpc_planner import IntelligentPlanner, MotionConstraints
 
 app = Flask(__name__, 
             template_folder='templates',
             static_folder='static')
-socketio = SocketIO(app, cors_allowed_origins="*")
+class OrjsonCodec:
+    """JSON-кодек Socket.IO на orjson (массивы NumPy сериализуются напрямую)"""
+    
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        # Socket.IO ожидает str, orjson возвращает bytes
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+def jresp(data):
+    """JSON-ответ через orjson: массивы NumPy сериализуются без .tolist()"""
+    return app.response_class(
+        orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype='application/json'
+    )
+
+# Асинхронный режим выбирается автоматически (eventlet из requirements.txt,
+# иначе потоки)
+socketio = SocketIO(app, cors_allowed_origins="*", json=OrjsonCodec)
+
+# Потоковая передача симуляции: каждая 10-я точка, пачками
+STREAM_DECIMATION = 10
+STREAM_BATCH_SIZE = 50
+STREAM_BATCH_INTERVAL = 0.05  # с между пачками
 
 # Глобальные объекты
 twin_model = None
@@ -41,7 +66,7 @@ def init_printer():
     twin_model = DigitalTwin(params)
     planner = IntelligentPlanner(twin_model)
     
-    return jsonify({
+    return jresp({
         'status': 'success',
         'params': params.to_dict()
     })
@@ -50,7 +75,7 @@ def init_printer():
 def plan_movement():
     """Планирование движения"""
     if not planner:
-        return jsonify({'error': 'Printer not initialized'}), 400
+        return jresp({'error': 'Printer not initialized'}), 400
     
     data = request.json
     from_pos = tuple(data['from'])
@@ -62,7 +87,7 @@ def plan_movement():
     # Подготовка данных для визуализации
     vis_data = prepare_visualization_data(result)
     
-    return jsonify({
+    return jresp({
         'status': 'success',
         'planning_result': result,
         'visualization': vis_data
@@ -72,15 +97,26 @@ def plan_movement():
 def optimize_gcode():
     """Оптимизация G-кода"""
     if not planner:
-        return jsonify({'error': 'Printer not initialized'}), 400
+        return jresp({'error': 'Printer not initialized'}), 400
     
-    data = request.json
-    gcode_points = [tuple(p) for p in data['points']]
+    # Разбор тела orjson и точки сразу одним массивом (n, 3)
+    try:
+        data = orjson.loads(request.data)
+        gcode_points = np.asarray(data['points'], dtype=np.float64)
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        return jresp({'error': f'Invalid request: {e}'}), 400
+    
+    # Пустой список точек - пустой путь, как и одна точка
+    if gcode_points.shape == (0,):
+        gcode_points = gcode_points.reshape(0, 3)
+    
+    if gcode_points.ndim != 2 or gcode_points.shape[1] != 3:
+        return jresp({'error': 'points must be a list of [x, y, z]'}), 400
     
     # Оптимизация всего пути
     result = planner.optimize_print_path(gcode_points)
     
-    return jsonify({
+    return jresp({
         'status': 'success',
         'optimization': result
     })
@@ -95,27 +131,34 @@ def start_real_time_simulation():
         """Поток симуляции с веб-сокетом"""
         simulation = twin_model.simulate_movement(trajectory, dt=0.01)
         
-        for i in range(len(simulation['time'])):
-            if i % 10 == 0:  # Отправляем каждые 10 точек
-                socketio.emit('simulation_update', {
-                    'time': float(simulation['time'][i]),
-                    'position': simulation['actual_pos'][i].tolist(),
-                    'target': simulation['target_pos'][i].tolist(),
-                    'error': simulation['tracking_error'][i].tolist(),
-                    'velocity': simulation['velocity'][i].tolist()
-                })
-                time.sleep(0.01)
+        # Отправляем каждые 10 точек, несколько точек в одном сообщении
+        step = STREAM_DECIMATION
+        t = simulation['time'][::step]
+        pos = simulation['actual_pos'][::step]
+        target = simulation['target_pos'][::step]
+        error = simulation['tracking_error'][::step]
+        velocity = simulation['velocity'][::step]
+        
+        for a in range(0, len(t), STREAM_BATCH_SIZE):
+            b = a + STREAM_BATCH_SIZE
+            socketio.emit('simulation_update_batch', {
+                'time': t[a:b].tolist(),
+                'position': pos[a:b].tolist(),
+                'target': target[a:b].tolist(),
+                'error': error[a:b].tolist(),
+                'velocity': velocity[a:b].tolist()
+            })
+            socketio.sleep(STREAM_BATCH_INTERVAL)
         
         socketio.emit('simulation_complete', {
             'quality': twin_model.calculate_quality_metrics(simulation)
         })
     
-    # Запуск в отдельном потоке
+    # Фоновая задача в асинхронной модели Socket.IO (eventlet или потоки)
     global simulation_thread
-    simulation_thread = threading.Thread(target=simulate_and_stream)
-    simulation_thread.start()
+    simulation_thread = socketio.start_background_task(simulate_and_stream)
     
-    return jsonify({'status': 'simulation_started'})
+    return jresp({'status': 'simulation_started'})
 
 def prepare_visualization_data(result: dict) -> dict:
     """Подготовка данных для визуализации"""
@@ -124,16 +167,23 @@ def prepare_visualization_data(result: dict) -> dict:
     # Уменьшаем количество точек для фронтенда
     step = max(1, len(sim['time']) // 1000)
     
+    # Один срез с шагом на массив, столбцы переводятся в списки целиком
+    tp = sim['target_pos'][::step]
+    ap = sim['actual_pos'][::step]
+    er = sim['tracking_error'][::step]
+    vel = sim['velocity'][::step]
+    acc = sim['acceleration'][::step]
+    
     return {
         'time': sim['time'][::step].tolist(),
-        'target_x': [p[0] for p in sim['target_pos'][::step]],
-        'target_y': [p[1] for p in sim['target_pos'][::step]],
-        'actual_x': [p[0] for p in sim['actual_pos'][::step]],
-        'actual_y': [p[1] for p in sim['actual_pos'][::step]],
-        'error_x': [e[0] for e in sim['tracking_error'][::step]],
-        'error_y': [e[1] for e in sim['tracking_error'][::step]],
-        'velocity': [v[0] for v in sim['velocity'][::step]],  # X скорость
-        'acceleration': [a[0] for a in sim['acceleration'][::step]],
+        'target_x': tp[:, 0].tolist(),
+        'target_y': tp[:, 1].tolist(),
+        'actual_x': ap[:, 0].tolist(),
+        'actual_y': ap[:, 1].tolist(),
+        'error_x': er[:, 0].tolist(),
+        'error_y': er[:, 1].tolist(),
+        'velocity': vel[:, 0].tolist(),  # X скорость
+        'acceleration': acc[:, 0].tolist(),
         'quality_metrics': result['quality_metrics']
     }
 
@@ -149,4 +199,5 @@ def handle_disconnect():
 if __name__ == '__main__':
     print("Starting NovaMotion Core Web Interface...")
     print("Open http://localhost:5000 in your browser")
-    socketio.run(app, debug=True, port=5000)
\ No newline at end of file
+    # Без debug: ни перезагрузчика, ни отладчика Werkzeug в пути запросов
+    socketio.run(app, port=5000)
\ No newline at end of file
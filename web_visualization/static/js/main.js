@@ -32,6 +32,16 @@ class NovaMotionCore {
             this.handleSimulationUpdate(data);
         });
 
+        this.socket.on('simulation_update_batch', (batch) => {
+            batch.time.forEach((t, i) => this.handleSimulationUpdate({
+                time: t,
+                position: batch.position[i],
+                target: batch.target[i],
+                error: batch.error[i],
+                velocity: batch.velocity[i]
+            }));
+        });
+
         this.socket.on('simulation_complete', (data) => {
             this.handleSimulationComplete(data);
         });